@@ -0,0 +1,179 @@
+import multiprocessing as mp
+import queue
+import random
+import numpy as np
+
+
+def get_actors_eps(nb_actors, base_eps=.4, alpha=7.):
+    # actor i explores with base_eps ** (1 + alpha * i / (nb_actors - 1)), from base_eps down to nearly greedy
+    if nb_actors == 1:
+        return [base_eps]
+
+    return [base_eps ** (1 + alpha * idx / (nb_actors - 1)) for idx in range(nb_actors)]
+
+
+def run_actor(actor_idx, env_builder, model_builder, state_shape, nb_actions, eps, chunk_size, nb_max_episode_steps, seed,
+weights_queue, experiences_queue, stop_event):
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(1)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+
+    from agent import DQNAgent
+
+    random.seed(seed)
+    np.random.seed(seed)
+
+    model = model_builder(state_shape, nb_actions) if model_builder is not None else None
+    agent = DQNAgent(state_shape, nb_actions, model=model, target_model=model, memory_limit=2, eps=eps, min_eps=eps)
+    env = env_builder()
+    nb_envs = env.nb_envs if agent.is_vectorized(env) else 1
+
+    agent.model.set_weights(weights_queue.get())
+
+    chunk = ([], [], [], [], [])
+    chunk_len = 0
+    episodes = ([], [], [])
+    episode_steps = np.zeros(shape=(nb_envs,), dtype=np.int64)
+    episode_rewards = np.zeros(shape=(nb_envs,), dtype=np.int64)
+
+    states = agent.reset_env(env)
+
+    while not stop_event.is_set():
+        actions = agent.select_actions(states, training=True)
+        next_states, rewards, dones, infos = agent.step_env(env, actions)
+        episode_rewards += rewards
+
+        final_states = np.copy(next_states)
+
+        for idx in np.flatnonzero(dones):
+            final_states[idx] = infos[idx]['terminal_observation']
+
+        for values, batch in zip(chunk, (states, actions, rewards, final_states, dones)):
+            values.append(batch)
+
+        chunk_len += nb_envs
+
+        truncated = (episode_steps == nb_max_episode_steps) & ~dones
+        episode_steps += 1
+        finished = dones | truncated
+        episode_scores = agent.get_scores(env, dones, infos)
+
+        if np.any(truncated):
+            next_states = agent.reset_env(env, truncated)
+
+        for idx in np.flatnonzero(finished):
+            episodes[0].append(int(episode_rewards[idx]))
+            episodes[1].append(int(episode_steps[idx]))
+            episodes[2].append(int(episode_scores[idx]))
+            episode_steps[idx] = 0
+            episode_rewards[idx] = 0
+
+        states = next_states
+
+        if chunk_len >= chunk_size:
+            experiences = tuple(np.concatenate(values) for values in chunk)
+
+            # block while the learner is behind, but keep checking whether it asked the actors to stop
+            while not stop_event.is_set():
+                try:
+                    experiences_queue.put((actor_idx, experiences, episodes), timeout=.1)
+                    break
+
+                except queue.Full:
+                    continue
+
+            chunk = ([], [], [], [], [])
+            chunk_len = 0
+            episodes = ([], [], [])
+
+            try:
+                agent.model.set_weights(weights_queue.get_nowait())
+            except queue.Empty:
+                pass
+
+    env.close()
+
+
+class ActorPool():
+    def __init__(self, nb_actors, env_builder, state_shape, nb_actions, model_builder=None, actors_eps=None, chunk_size=100,
+    nb_max_episode_steps=-1, queue_size=None):
+        assert type(nb_actors) is int and nb_actors > 0, 'nb_actors must be a positive integer'
+        assert actors_eps is None or len(actors_eps) == nb_actors, 'actors_eps must hold one eps per actor'
+
+        # tensorflow does not survive a fork once initialized, so actors are spawned
+        context = mp.get_context('spawn')
+
+        self.nb_actors = nb_actors
+        self.actors_eps = get_actors_eps(nb_actors) if actors_eps is None else list(actors_eps)
+        self.stop_event = context.Event()
+        self.weights_queues = [context.Queue(maxsize=1) for _ in range(nb_actors)]
+        self.experiences_queue = context.Queue(maxsize=4*nb_actors if queue_size is None else queue_size)
+
+        self.actors = [context.Process(target=run_actor, args=(idx, env_builder, model_builder, state_shape, nb_actions,
+        self.actors_eps[idx], chunk_size, nb_max_episode_steps, np.random.randint(0, 2**31), self.weights_queues[idx],
+        self.experiences_queue, self.stop_event), daemon=True) for idx in range(nb_actors)]
+
+
+    def start(self, weights):
+        for actor in self.actors:
+            actor.start()
+
+        self.publish_weights(weights)
+
+
+    def publish_weights(self, weights):
+        # replace weights the actor has not picked up yet, so it always syncs to the latest ones
+        for weights_queue in self.weights_queues:
+            try:
+                weights_queue.get_nowait()
+            except queue.Empty:
+                pass
+
+            try:
+                weights_queue.put_nowait(weights)
+            except queue.Full:
+                pass
+
+
+    def get_experiences(self, block=True, timeout=1.):
+        experiences = []
+
+        try:
+            experiences.append(self.experiences_queue.get(block=block, timeout=timeout))
+
+            while True:
+                experiences.append(self.experiences_queue.get_nowait())
+
+        except queue.Empty:
+            pass
+
+        return experiences
+
+
+    def close(self, timeout=10.):
+        self.stop_event.set()
+
+        # actors blocked on a full queue only exit once it is drained
+        for actor in self.actors:
+            while actor.is_alive():
+                self.get_experiences(block=False)
+                actor.join(timeout=.1)
+
+                timeout -= .1
+
+                if timeout <= 0:
+                    actor.terminate()
+                    actor.join()
+
+        # weights no stopped actor will read would otherwise keep the queue feeder threads, and with them the interpreter
+        # exit, waiting on a full pipe
+        for closing_queue in self.weights_queues + [self.experiences_queue]:
+            try:
+                while True:
+                    closing_queue.get_nowait()
+
+            except (queue.Empty, OSError, ValueError):
+                pass
+
+            closing_queue.close()
+            closing_queue.cancel_join_thread()
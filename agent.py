@@ -1,32 +1,48 @@
 import os
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3' 
 
-from collections import namedtuple, deque
+import tensorflow as tf
 from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import Flatten, Dense, Conv2D, BatchNormalization
 from tensorflow.keras.optimizers import Adam
-import random
 import numpy as np
 import time
 import gc
-from pympler import muppy, summary
+import threading
+from memory import ReplayMemory, MemmapReplayMemory, DedupReplayMemory, PrioritizedReplayMemory
+from actors import ActorPool
+from profiler import NullProfiler
+from learner import BackgroundLearner
+from validator import BackgroundValidator
+from base_agent import Agent
+from inference import export_model
 
 
-Memory = namedtuple('Memory', ['states', 'actions', 'rewards', 'next_states', 'terminals'])
-
-
-class DQNAgent():
+class DQNAgent(Agent):
     def __init__(self, state_shape, nb_actions, model=None, target_model=None, memory_limit=50_000, gamma=.99,
-    eps=1., min_eps=.1, eps_decay_steps=None, learning_rate=.0001):
-        self.state_shape = state_shape
-        self.state_batch_shape = (1,) + self.state_shape
-        self.nb_actions = nb_actions
+    eps=1., min_eps=.1, eps_decay_steps=None, learning_rate=.0001, deduplicate_states=False, prioritized_replay=False, priority_alpha=.6,
+    priority_beta=.4, priority_beta_annealing_steps=None, fused_train_step=False, huber_loss=False, compiled_policy=True,
+    memory_path=None, packed_observations=False):
+        super().__init__(state_shape, nb_actions, eps)
+
+        assert not (deduplicate_states and prioritized_replay), 'deduplicate_states and prioritized_replay can not be combined'
+        assert memory_path is None or not (deduplicate_states or prioritized_replay), \
+        'memory_path can not be combined with deduplicate_states or prioritized_replay'
+
+        if memory_path is not None:
+            self.memory = MemmapReplayMemory(memory_limit, state_shape, memory_path, packed=packed_observations)
+        elif prioritized_replay:
+            self.memory = PrioritizedReplayMemory(memory_limit, state_shape, alpha=priority_alpha, beta=priority_beta,
+            packed=packed_observations)
+        elif deduplicate_states:
+            self.memory = DedupReplayMemory(memory_limit, state_shape, packed=packed_observations)
+        else:
+            self.memory = ReplayMemory(memory_limit, state_shape, packed=packed_observations)
 
-        self.memory = Memory(deque(maxlen=memory_limit), deque(maxlen=memory_limit), deque(maxlen=memory_limit),
-        deque(maxlen=memory_limit), deque(maxlen=memory_limit))
+        self.prioritized_replay = prioritized_replay
+        self.priority_beta_increment = 0 if priority_beta_annealing_steps is None else ((1.-priority_beta)/priority_beta_annealing_steps)
 
         self.gamma = gamma
-        self.eps = eps
         self.min_eps = min_eps
         self.eps_decay = 0 if eps_decay_steps is None else ((eps-min_eps)/eps_decay_steps)
         self.learning_rate = learning_rate
@@ -35,11 +51,85 @@ class DQNAgent():
         self.target_model = target_model if target_model is not None else self.build_default_model(name='target-model')
         self.update_target_weights()
 
+        self.huber_loss = huber_loss
+
+        # the train_on_batch path takes its loss from the compiled model, the fused step computes it itself
+        if huber_loss and not fused_train_step:
+            self.model.compile(optimizer=self.model.optimizer, loss=tf.keras.losses.Huber(delta=1.))
+
+        self.train_step = self.build_train_step() if fused_train_step else None
+        self.policy = self.build_policy() if compiled_policy else None
+
+        # set by fit so replay_experience can time its phases
+        self.profiler = NullProfiler()
+
+        # guard the memory and the model weights when training runs on a background thread
+        self.memory_lock = threading.Lock()
+        self.model_lock = threading.Lock()
+
 
     def update_target_weights(self):
         self.target_model.set_weights(self.model.get_weights())
     
 
+    def build_train_step(self):
+        # online and target q values, bellman targets and the gradient step run as one graph. the loss matches the compiled
+        # per-sample mean over actions of the keras losses, where only the taken action has a non-zero error
+        model = self.model
+        target_model = self.target_model
+        optimizer = self.model.optimizer
+        gamma = self.gamma
+        nb_actions = self.nb_actions
+        huber_loss = self.huber_loss
+
+        state_spec = tf.TensorSpec(shape=(None,) + tuple(self.state_shape), dtype=tf.float32)
+        batch_spec = tf.TensorSpec(shape=(None,), dtype=tf.float32)
+
+        @tf.function(input_signature=[state_spec, tf.TensorSpec(shape=(None,), dtype=tf.int32), batch_spec, state_spec, batch_spec,
+        batch_spec])
+        def train_step(states, actions, rewards, next_states, terminals, sample_weight):
+            future_q_values = target_model(next_states, training=False)
+            targets = rewards + terminals * gamma * tf.reduce_max(future_q_values, axis=1)
+
+            with tf.GradientTape() as tape:
+                q_values = tf.gather(model(states, training=True), actions, axis=1, batch_dims=1)
+                td_errors = targets - q_values
+
+                if huber_loss:
+                    abs_td_errors = tf.abs(td_errors)
+                    losses = tf.where(abs_td_errors <= 1., .5 * tf.square(td_errors), abs_td_errors - .5)
+                else:
+                    losses = tf.square(td_errors)
+
+                loss = tf.reduce_mean(sample_weight * losses) / nb_actions
+
+            gradients = tape.gradient(loss, model.trainable_variables)
+            optimizer.apply_gradients(zip(gradients, model.trainable_variables))
+
+            return td_errors
+
+        return train_step
+
+
+    def build_policy(self):
+        # greedy actions for a batch of states straight from the graph, without the keras predict machinery
+        model = self.model
+
+        @tf.function(input_signature=[tf.TensorSpec(shape=(None,) + tuple(self.state_shape), dtype=tf.float32)])
+        def policy(states):
+            return tf.argmax(model(states, training=False), axis=1, output_type=tf.int32)
+
+        # calling the concrete function skips the tf.function argument dispatch
+        return policy.get_concrete_function()
+
+
+    def build_validation_agent(self):
+        # greedy copy of the agent that validation threads load weight snapshots into
+        model = tf.keras.models.clone_model(self.model)
+        return DQNAgent(self.state_shape, self.nb_actions, model=model, target_model=model, memory_limit=2,
+        compiled_policy=self.policy is not None)
+
+
     def build_default_model(self, name='model'):
         model = Sequential(layers=[
             Flatten(input_shape=self.state_shape),
@@ -55,11 +145,12 @@ class DQNAgent():
     
 
     def store_experience(self, state, action, reward, next_state, terminal):
-        self.memory.states.append(state)
-        self.memory.actions.append(action)
-        self.memory.rewards.append(reward)
-        self.memory.next_states.append(next_state)
-        self.memory.terminals.append(terminal)
+        self.memory.append(state, action, reward, next_state, terminal)
+
+
+    def store_experiences(self, states, actions, rewards, next_states, terminals):
+        with self.memory_lock:
+            self.memory.extend(states, actions, rewards, next_states, terminals)
 
 
     def create_experiences(self, env, nb_steps, nb_max_episode_steps=-1):
@@ -83,101 +174,84 @@ class DQNAgent():
                 done = True
 
 
-    def get_batch(self, batch_size):
-        memory_size = len(self.memory.states)
-        states = np.empty(shape=(batch_size,) + self.state_shape, dtype=np.float64)
-        actions = np.empty(shape=(batch_size,), dtype=np.int32)
-        rewards = np.empty(shape=(batch_size,), dtype=np.float64)
-        next_states = np.empty(shape=(batch_size,) + self.state_shape, dtype=np.float64)
-        terminals = np.empty(shape=(batch_size,), dtype=np.int8)
-
-        if batch_size <= memory_size:
-            indices = random.sample(range(memory_size), batch_size)
-            
-        else:
-            indices = np.random.randint(0, memory_size, batch_size)
+    def get_experiences(self, indices):
+        states, actions, rewards, next_states, terminals = self.memory.get(indices)
 
-        for sample_idx, idx in enumerate(indices):
-            states[sample_idx] = self.memory.states[idx]
-            actions[sample_idx] = self.memory.actions[idx]
-            rewards[sample_idx] = self.memory.rewards[idx]
-            next_states[sample_idx] = self.memory.next_states[idx]
-            terminals[sample_idx] = not self.memory.terminals[idx] # invert terminals value
+        states = states.astype(np.float32)
+        actions = actions.astype(np.int32)
+        next_states = next_states.astype(np.float32)
+        terminals = np.logical_not(terminals).astype(np.int8) # invert terminals value
 
         return states, actions, rewards, next_states, terminals
 
 
-    def logger(self, nb_episodes=None, nb_steps=None, episode_nb=None, step_nb=None, episode_reward=None, score=None, start_time=None,
-    final_log=False, bar_length=50, clear_line=True, training=False):
-        try:
-            clear_log = '\033[2K' if clear_line else ''
-            progress_log = ''
-            reward_log = ''
-            score_log = f' - score {score}' if score is not None else ''
-            time_log = ''
-            param_log = f' - eps {self.eps:.3f}' if training else ''
-            log_end = '\n' if final_log else '\r'
-
-            if nb_episodes is not None:
-                progress = int((episode_nb/nb_episodes)*bar_length)
-                progress_log = f' - episode ({episode_nb}/{nb_episodes}) - {episode_nb*100/nb_episodes:.2f}%'
-            else:
-                progress = int((step_nb/nb_steps)*bar_length)
-
-                if episode_nb is not None:
-                    progress_log = f' - episode {episode_nb} - step ({step_nb}/{nb_steps}) - {step_nb*100/nb_steps:.2f}%'
-                else:
-                    progress_log = f' - step ({step_nb}/{nb_steps})'
+    def get_batch(self, batch_size):
+        return self.get_experiences(self.memory.sample_indices(batch_size))
 
-            if episode_reward is not None:
-                reward_log = f' - episode reward {episode_reward:.2f}'
-            
-            if start_time is not None:
-                time_log = f' - time {time.perf_counter() - start_time:.2f}s'
 
-            log = clear_log + f"[{'='*(progress-1)}{'>'*min(1, progress)}{'.'*(bar_length-progress)}]" + progress_log + reward_log + \
-            score_log + param_log + time_log + log_end
-            print(log, end='')
-        
-        except Exception:
-            print('Logger Error')
+    def get_greedy_actions(self, states):
+        if self.policy is not None:
+            return self.policy(tf.convert_to_tensor(np.asarray(states, dtype=np.float32))).numpy()
+
+        return np.argmax(self.model.predict_on_batch(states), axis=1)
 
-    
-    def select_action(self, state, training=False):
-        if not training:
-            q_values = self.model.predict_on_batch(state)[0]
-            return np.argmax(q_values)
-        
-        if np.random.uniform() < self.eps:
-            return np.random.randint(0, self.nb_actions)
-        
-        q_values = self.model.predict_on_batch(state)[0]
-        return np.argmax(q_values)
-    
 
     def replay_experience(self, batch_size, episode_step):
-        states, actions, rewards, next_states, terminals = self.get_batch(batch_size)
+        with self.profiler.phase('get_batch'), self.memory_lock:
+            indices = self.memory.sample_indices(batch_size)
+            states, actions, rewards, next_states, terminals = self.get_experiences(indices)
+            batch_indices = np.arange(batch_size)
+            sample_weight = self.memory.get_importance_weights(indices) if self.prioritized_replay else None
 
-        target = self.model.predict_on_batch(states)
-        future_q_values = self.target_model.predict_on_batch(next_states)
+        if self.train_step is not None:
+            with self.profiler.phase('train'):
+                sample_weight = np.ones(batch_size, dtype=np.float32) if sample_weight is None else sample_weight
+                td_errors = self.train_step(states, actions, rewards, next_states, terminals.astype(np.float32), sample_weight)
+
+        else:
+            with self.profiler.phase('predict'):
+                target = self.model.predict_on_batch(states)
+                future_q_values = self.target_model.predict_on_batch(next_states)
 
-        for idx in range(batch_size):
-            # if current state is terminal -> terminals[idx] = 0 -> target = rewards[idx] + terminals[idx] * self.gamma 
-            #  * np.amax(future_q_values[idx]) = reward only
+            q_values = target[batch_indices, actions]
 
-            # if current state is NOT terminal -> terminals[idx] = 1 -> target = rewards[idx] + terminals[idx] * self.gamma
-            # * np.amax(future_q_values[idx]) = reward + expected return from next state
+            # if current state is terminal -> terminals = 0 -> target = rewards + terminals * self.gamma * max(future_q_values)
+            # = reward only
 
-            target[idx, actions[idx]] = rewards[idx] + terminals[idx] * self.gamma * np.amax(future_q_values[idx])
+            # if current state is NOT terminal -> terminals = 1 -> target = rewards + terminals * self.gamma * max(future_q_values)
+            # = reward + expected return from next state
 
-        self.model.train_on_batch(states, target)
+            target[batch_indices, actions] = rewards + terminals * self.gamma * np.amax(future_q_values, axis=1)
+            td_errors = target[batch_indices, actions] - q_values
+
+            with self.profiler.phase('train'):
+                self.model.train_on_batch(states, target, sample_weight=sample_weight)
+
+        if self.prioritized_replay:
+            with self.memory_lock:
+                self.memory.update_priorities(indices, np.asarray(td_errors))
+                self.memory.beta = min(1., self.memory.beta + self.priority_beta_increment*episode_step)
+
+        self.profiler.count_train_steps()
         self.eps = max(self.min_eps, self.eps - self.eps_decay*episode_step)
     
 
+    def train(self, batch_size, gradient_steps, nb_steps):
+        # eps and beta advance by the nb_steps env steps since the previous update, once per update
+        with self.model_lock:
+            for gradient_step in range(gradient_steps):
+                self.replay_experience(batch_size, nb_steps if gradient_step == 0 else 0)
+
+
     def save_weights(self, filepath):
         self.model.save_weights(filepath)
     
 
+    def export_weights(self, filepath):
+        # npz weights that inference.NumpyAgent plays with, without tensorflow
+        export_model(self.model, filepath)
+
+
     def load_weights(self, filepath, update_target_weights=True):
         self.model.load_weights(filepath)
 
@@ -185,17 +259,16 @@ class DQNAgent():
             self.update_target_weights()
     
 
-    def preprocess_state(self, state):
-        return np.reshape(state, self.state_batch_shape)
-    
-
     def fit(self, env, nb_steps, batch_size=32, target_weights_update=10_000, nb_max_episode_steps=-1, validation_steps=100_000,
-    validation_episodes=5, save_weights_steps=100_000, weights_save_path='model_weights.h5', verbose=1, visualize=False, gc_steps=10_000):
+    validation_episodes=5, save_weights_steps=100_000, weights_save_path='model_weights.h5', verbose=1, visualize=False, gc_steps=10_000,
+    memory_monitor=None, profiler=None, train_interval=None, gradient_steps=1, background_training=False, max_pending_updates=2,
+    checkpoint=None, validation_env=None, history_writer=None):
+        # train_interval=None trains once per finished episode, otherwise gradient_steps updates run every train_interval env
+        # steps, on a background thread that overlaps with env stepping when background_training is set. with a validation_env,
+        # validation plays on it in the background with a snapshot of the weights instead of pausing training. with a
+        # history_writer, episodes are streamed to it instead of kept in the returned lists
         start_time = time.perf_counter()
 
-        mem_log = open('mem_log', 'a+')
-        mem_log_str = ""
-
         episodes = []
         rewards = []
         steps = []
@@ -203,91 +276,232 @@ class DQNAgent():
         validation_episodes_list = []
         validation_scores_list = []
 
+        vectorized = self.is_vectorized(env)
+        nb_envs = env.nb_envs if vectorized else 1
+        visualize = visualize and not vectorized
+
+        # states are stored one step after they are observed, so they must not be views that the env overwrites
+        assert getattr(env, 'copy_state', True), 'self.fit (DQNAgent): env must return copied states'
+
+        # deduplication relies on consecutive transitions coming from the same episode
+        assert not (vectorized and isinstance(self.memory, DedupReplayMemory)), \
+        'self.fit (DQNAgent): deduplicated states memory does not support vectorized envs'
+
+        assert train_interval is not None or not background_training, 'self.fit (DQNAgent): background training needs a train_interval'
+
         episode_nb = 0
-        episode_step = 0
-        episode_reward = 0
-        done = False
+        episode_steps = np.zeros(shape=(nb_envs,), dtype=np.int64)
+        episode_rewards = np.zeros(shape=(nb_envs,), dtype=np.int64)
         validate = False
+        step = 0
+        update_steps = 0
 
-        state = env.reset()
+        # resume from the latest checkpoint, episodes that were in progress when it was written are dropped
+        if checkpoint is not None:
+            fit_state, history = checkpoint.restore(self)
 
-        for step in range(nb_steps):
+            if fit_state is not None:
+                step = fit_state['step']
+                episode_nb = fit_state['episode_nb']
+                episodes, rewards, steps, scores = history['episodes'], history['rewards'], history['steps'], history['scores']
+                validation_episodes_list = history['validation_episodes']
+                validation_scores_list = history['validation_scores']
+
+                # checkpoints saved without a history writer hold no row counts
+                if history_writer is not None and fit_state.get('history_rows') is not None:
+                    history_writer.truncate(fit_state['history_rows'])
+
+        learner = BackgroundLearner(self, batch_size, gradient_steps, max_pending_updates) if background_training else None
+
+        if learner is not None:
+            learner.start()
+
+        validator = None
+
+        if validation_env is not None:
+            validator = BackgroundValidator(self.build_validation_agent(), validation_env, validation_episodes, nb_max_episode_steps)
+            validator.start()
+
+        if memory_monitor is not None:
+            memory_monitor.start()
+
+        if profiler is not None:
+            profiler.start()
+            self.profiler = profiler
+
+        prof = self.profiler
+        states = self.reset_env(env)
+
+        while step < nb_steps:
             if visualize:
                 env.render()
 
-            state = self.preprocess_state(state)
-            action = self.select_action(state, training=True)
-            next_state, reward, done, info = env.step(action)
-            episode_reward += reward
+            with prof.phase('select_action'):
+                actions = self.select_actions(states, training=True)
 
-            next_state = self.preprocess_state(next_state)
+            with prof.phase('env_step'):
+                next_states, step_rewards, dones, infos = self.step_env(env, actions)
 
-            self.store_experience(state, action, reward, next_state, done)
-            state = next_state
+            episode_rewards += step_rewards
+            prof.count_steps(nb_envs)
+
+            with prof.phase('store'):
+                final_states = np.copy(next_states)
+
+                for idx in np.flatnonzero(dones):
+                    final_states[idx] = infos[idx]['terminal_observation']
+
+                self.store_experiences(states, actions, step_rewards, final_states, dones)
+
+            if train_interval is not None:
+                update_steps += nb_envs
 
-            if step % target_weights_update == 0:
-                self.update_target_weights()
+                # a batch of boards can cross several interval boundaries, each one gets its round of updates so the
+                # replay ratio does not depend on nb_envs
+                nb_updates = (step + nb_envs - 1) // train_interval - (step - 1) // train_interval
 
-            if step % validation_steps == 0:
-                validate = True
+                if nb_updates > 0:
+                    if learner is not None:
+                        with prof.phase('wait_learner'):
+                            for update in range(nb_updates):
+                                learner.request_update(update_steps if update == 0 else 0)
+                    else:
+                        self.train(batch_size, gradient_steps * nb_updates, update_steps)
 
-            if step % gc_steps == 0:
+                    update_steps = 0
+
+            if self.interval_reached(step, nb_envs, target_weights_update):
+                with prof.phase('target_update'), self.model_lock:
+                    self.update_target_weights()
+
+            if self.interval_reached(step, nb_envs, validation_steps):
+                if validator is not None:
+                    with prof.phase('validation'), self.model_lock:
+                        validator.request_validation(max(episode_nb - 1, 0), self.model.get_weights())
+                else:
+                    validate = True
+
+            if validator is not None:
+                for validation_episode_nb, validation_score in validator.get_results():
+                    validation_episodes_list.append(validation_episode_nb)
+                    validation_scores_list.append(validation_score)
+
+                    if history_writer is not None:
+                        history_writer.append('validation', episode=validation_episode_nb, score=validation_score)
+
+            if self.interval_reached(step, nb_envs, gc_steps):
                 gc.collect()
 
-            if step % 100_000 == 0:
-                all_objs = muppy.get_objects()
-                sum = summary.summarize(all_objs)
-                for row in summary.format_(sum, limit=5):
-                    mem_log_str += row + '\n'
-                mem_log.write(mem_log_str + '\n\n')
+            if memory_monitor is not None and self.interval_reached(step, nb_envs, memory_monitor.interval):
+                memory_monitor.sample(step)
 
+            if profiler is not None and self.interval_reached(step, nb_envs, profiler.interval):
+                profiler.report(step)
 
-            if nb_max_episode_steps == episode_step:
-                done = True
+            truncated = (episode_steps == nb_max_episode_steps) & ~dones
+            episode_steps += 1
+            finished = dones | truncated
+            episode_scores = self.get_scores(env, dones, infos)
 
-            episode_step += 1
-            
-            if done:
-                self.replay_experience(batch_size, episode_step)
+            if np.any(truncated):
+                next_states = self.reset_env(env, truncated)
 
-                if validate:
-                    validation_history = self.test(env, validation_episodes, nb_max_episode_steps=nb_max_episode_steps,
-                    verbose=0, visualize=False)
-                    validation_episodes_list.append(episode_nb)
-                    validation_scores_list.append(np.mean(validation_history['scores']))
-                    validate = False
+            for idx in np.flatnonzero(finished):
+                if train_interval is None:
+                    self.replay_experience(batch_size, episode_steps[idx])
 
-                episodes.append(episode_nb)
-                rewards.append(episode_reward)
-                steps.append(episode_step)
-                scores.append(env.curr_score) # added scores
+                if history_writer is not None:
+                    history_writer.append('episodes', episode=episode_nb, reward=int(episode_rewards[idx]),
+                    steps=int(episode_steps[idx]), score=int(episode_scores[idx]))
+                else:
+                    episodes.append(episode_nb)
+                    rewards.append(int(episode_rewards[idx]))
+                    steps.append(int(episode_steps[idx]))
+                    scores.append(int(episode_scores[idx])) # added scores
 
                 if verbose == 1:
-                    self.logger(nb_steps=nb_steps, episode_nb=episode_nb+1, step_nb=step+1, episode_reward=episode_reward, score=env.curr_score,
-                    start_time=start_time, final_log=False, training=True)
+                    self.logger(nb_steps=nb_steps, episode_nb=episode_nb+1, step_nb=step+idx+1, episode_reward=episode_rewards[idx],
+                    score=episode_scores[idx], start_time=start_time, final_log=False, training=True, profiler_log=prof.get_log())
 
                 episode_nb += 1
-                episode_step = 0
-                episode_reward = 0
-                done = False
+                episode_steps[idx] = 0
+                episode_rewards[idx] = 0
 
-                state = env.reset()
+            if validate and np.any(finished):
+                # validation plays on the training env, so every board restarts afterwards
+                with prof.phase('validation'):
+                    validation_history = self.test(env, validation_episodes, nb_max_episode_steps=nb_max_episode_steps,
+                    verbose=0, visualize=False)
+                validation_episodes_list.append(episode_nb - 1)
+                validation_scores_list.append(np.mean(validation_history['scores']))
+
+                if history_writer is not None:
+                    history_writer.append('validation', episode=episode_nb - 1, score=validation_scores_list[-1])
+                validate = False
+
+                next_states = self.reset_env(env)
+                episode_steps[:] = 0
+                episode_rewards[:] = 0
+
+            states = next_states
+
+            if save_weights_steps is not None and self.interval_reached(step, nb_envs, save_weights_steps):
+                with prof.phase('save_weights'), self.model_lock:
+                    self.save_weights(weights_save_path) 
+
+            step += nb_envs
+
+            if checkpoint is not None and self.interval_reached(step - nb_envs + 1, nb_envs, checkpoint.checkpoint_steps):
+                with prof.phase('checkpoint'), self.model_lock, self.memory_lock:
+                    if history_writer is not None:
+                        history_writer.flush()
+
+                    checkpoint.save(self, step, {'step':step, 'episode_nb':episode_nb,
+                    'history_rows':None if history_writer is None else history_writer.get_state()}, {'episodes':episodes, 'rewards':rewards,
+                    'steps':steps, 'scores':scores, 'validation_episodes':validation_episodes_list,
+                    'validation_scores':validation_scores_list})
 
-            if save_weights_steps is not None and step % save_weights_steps == 0:
-                self.save_weights(weights_save_path) 
+        if learner is not None:
+            learner.close()
 
+        if validator is not None:
+            for validation_episode_nb, validation_score in validator.close():
+                validation_episodes_list.append(validation_episode_nb)
+                validation_scores_list.append(validation_score)
+
+                if history_writer is not None:
+                    history_writer.append('validation', episode=validation_episode_nb, score=validation_score)
+
+        if history_writer is not None:
+            history_writer.flush()
+
+        if profiler is not None:
+            profiler.report(step)
         
         if verbose == 1:
-            self.logger(nb_steps=nb_steps, episode_nb=episode_nb+1, step_nb=step+1, episode_reward=episode_reward, score=env.curr_score,
-            start_time=start_time, final_log=True, training=True)
+            self.logger(nb_steps=nb_steps, episode_nb=episode_nb+1, step_nb=step, episode_reward=episode_rewards[0],
+            score=self.get_scores(env, dones, infos)[0], start_time=start_time, final_log=True, training=True,
+            profiler_log=prof.get_log())
+
+        if memory_monitor is not None:
+            memory_monitor.close()
 
-        mem_log.close()
+        if profiler is not None:
+            profiler.close()
+            self.profiler = NullProfiler()
+
+        if isinstance(self.memory, MemmapReplayMemory):
+            self.memory.flush()
 
         return {'episodes':episodes, 'rewards':rewards, 'steps':steps, 'scores':scores, 'validation':{'episodes':validation_episodes_list,
         'scores':validation_scores_list}}
 
 
-    def test(self, env, nb_episodes, nb_max_episode_steps=-1, verbose=1, visualize=True):
+    def fit_distributed(self, env_builder, nb_steps, nb_actors, model_builder=None, actors_eps=None, batch_size=32,
+    target_weights_update=10_000, weights_sync_steps=100, chunk_size=100, nb_max_episode_steps=-1, save_weights_steps=100_000,
+    weights_save_path='model_weights.h5', verbose=1):
+        # env_builder and model_builder are called inside the actor processes, so they must be picklable (e.g. SnakeEnv and
+        # models.build_model_8). actors act with their own fixed eps while this process only stores experiences and trains
         start_time = time.perf_counter()
 
         episodes = []
@@ -295,40 +509,58 @@ class DQNAgent():
         steps = []
         scores = []
 
-        for episode in range(nb_episodes):
-            state = env.reset()
-            done = False
-            episode_reward = 0
-            episode_step = 0
+        pool = ActorPool(nb_actors, env_builder, self.state_shape, self.nb_actions, model_builder=model_builder, actors_eps=actors_eps,
+        chunk_size=chunk_size, nb_max_episode_steps=nb_max_episode_steps)
 
-            while not done:
-                if visualize:
-                    env.render()
-                
-                state = self.preprocess_state(state)
-                action = self.select_action(state)
+        episode_nb = 0
+        train_step = 0
+        new_steps = 0
+        step = 0
 
-                next_state, reward, done, info = env.step(action)
+        pool.start(self.model.get_weights())
 
-                episode_reward += reward
-                state = next_state
+        try:
+            while step < nb_steps:
+                # only wait for actors while there is nothing to train on
+                for actor_idx, experiences, actor_episodes in pool.get_experiences(block=len(self.memory) == 0):
+                    self.store_experiences(*experiences)
+                    nb_experiences = len(experiences[1])
 
-                if episode_step == nb_max_episode_steps:
-                    done = True
-                
-                episode_step += 1
-            
-            episodes.append(episode)
-            rewards.append(episode_reward)
-            steps.append(episode_step)
-            scores.append(env.curr_score)
-
-            if verbose == 1:
-                self.logger(nb_episodes=nb_episodes, episode_nb=episode+1, episode_reward=episode_reward, score=env.curr_score,
-                start_time=start_time, final_log=False)
-        
-        if verbose == 1:
-            self.logger(nb_episodes=nb_episodes, episode_nb=episode+1, episode_reward=episode_reward, score=env.curr_score,
-            start_time=start_time, final_log=True)
-        
-        return {'episodes':episodes, 'rewards':rewards, 'steps':steps, 'scores':scores}
\ No newline at end of file
+                    if self.interval_reached(step, nb_experiences, target_weights_update):
+                        self.update_target_weights()
+
+                    if save_weights_steps is not None and self.interval_reached(step, nb_experiences, save_weights_steps):
+                        self.save_weights(weights_save_path)
+
+                    step += nb_experiences
+                    new_steps += nb_experiences
+
+                    for episode_reward, episode_step, episode_score in zip(*actor_episodes):
+                        episodes.append(episode_nb)
+                        rewards.append(episode_reward)
+                        steps.append(episode_step)
+                        scores.append(episode_score)
+                        episode_nb += 1
+
+                    if verbose == 1 and len(actor_episodes[0]) > 0:
+                        self.logger(nb_steps=nb_steps, episode_nb=episode_nb, step_nb=min(step, nb_steps), episode_reward=rewards[-1],
+                        score=scores[-1], start_time=start_time, final_log=False)
+
+                if len(self.memory) == 0:
+                    continue
+
+                self.replay_experience(batch_size, new_steps)
+                new_steps = 0
+                train_step += 1
+
+                if train_step % weights_sync_steps == 0:
+                    pool.publish_weights(self.model.get_weights())
+
+        finally:
+            pool.close()
+
+        if verbose == 1 and len(episodes) > 0:
+            self.logger(nb_steps=nb_steps, episode_nb=episode_nb, step_nb=min(step, nb_steps), episode_reward=rewards[-1],
+            score=scores[-1], start_time=start_time, final_log=True)
+
+        return {'episodes':episodes, 'rewards':rewards, 'steps':steps, 'scores':scores, 'validation':{'episodes':[], 'scores':[]}}
@@ -0,0 +1,221 @@
+import numpy as np
+import time
+from profiler import NullProfiler
+from vec_env import VecSnakeEnv
+
+
+class Agent():
+    # the acting side shared by every agent: action selection, env stepping, logging and the test loop. subclasses provide
+    # get_greedy_actions, so playing does not depend on how q values are computed
+    def __init__(self, state_shape, nb_actions, eps=0.):
+        self.state_shape = state_shape
+        self.state_batch_shape = (1,) + self.state_shape
+        self.nb_actions = nb_actions
+        self.eps = eps
+
+
+    def get_greedy_actions(self, states):
+        raise NotImplementedError
+
+
+    def select_action(self, state, training=False):
+        if training and np.random.uniform() < self.eps:
+            return np.random.randint(0, self.nb_actions)
+        
+        return self.get_greedy_actions(state)[0]
+
+
+    def select_actions(self, states, training=False):
+        nb_states = len(states)
+
+        if training:
+            explore = np.random.uniform(size=nb_states) < self.eps
+            actions = np.random.randint(0, self.nb_actions, size=nb_states)
+
+            if np.all(explore):
+                return actions
+        
+        greedy_actions = self.get_greedy_actions(states)
+
+        if training:
+            return np.where(explore, actions, greedy_actions)
+
+        return greedy_actions
+
+
+    def preprocess_state(self, state):
+        return np.reshape(state, self.state_batch_shape)
+
+
+    def is_vectorized(self, env):
+        return getattr(env, 'nb_envs', None) is not None
+
+
+    def reset_env(self, env, mask=None):
+        if self.is_vectorized(env):
+            return env.reset(mask)
+        
+        return self.preprocess_state(env.reset())
+
+
+    def step_env(self, env, actions, mask=None):
+        # single envs are stepped through the batched interface of VecSnakeEnv, including its auto reset
+        if self.is_vectorized(env):
+            return env.step(actions, mask)
+        
+        next_state, reward, done, info = env.step(int(actions[0]))
+
+        if done:
+            info['terminal_observation'] = next_state
+            info['score'] = env.curr_score
+            next_state = env.reset()
+        
+        return self.preprocess_state(next_state), np.array([reward]), np.array([done]), [info]
+
+
+    def get_scores(self, env, dones, infos):
+        curr_scores = np.reshape(env.curr_score, (-1,))
+        return [infos[idx]['score'] if dones[idx] else curr_scores[idx] for idx in range(len(dones))]
+
+
+    def interval_reached(self, step, nb_steps, interval):
+        # whether any step in [step, step + nb_steps) is a multiple of interval
+        return (step + nb_steps - 1) // interval * interval >= step
+
+
+    def logger(self, nb_episodes=None, nb_steps=None, episode_nb=None, step_nb=None, episode_reward=None, score=None, start_time=None,
+    final_log=False, bar_length=50, clear_line=True, training=False, profiler_log=None):
+        try:
+            clear_log = '\033[2K' if clear_line else ''
+            progress_log = ''
+            reward_log = ''
+            score_log = f' - score {score}' if score is not None else ''
+            time_log = ''
+            profiler_log = f' - {profiler_log}' if profiler_log is not None else ''
+            param_log = f' - eps {self.eps:.3f}' if training else ''
+            log_end = '\n' if final_log else '\r'
+
+            if nb_episodes is not None:
+                progress = int((episode_nb/nb_episodes)*bar_length)
+                progress_log = f' - episode ({episode_nb}/{nb_episodes}) - {episode_nb*100/nb_episodes:.2f}%'
+            else:
+                progress = int((step_nb/nb_steps)*bar_length)
+
+                if episode_nb is not None:
+                    progress_log = f' - episode {episode_nb} - step ({step_nb}/{nb_steps}) - {step_nb*100/nb_steps:.2f}%'
+                else:
+                    progress_log = f' - step ({step_nb}/{nb_steps})'
+
+            if episode_reward is not None:
+                reward_log = f' - episode reward {episode_reward:.2f}'
+            
+            if start_time is not None:
+                time_log = f' - time {time.perf_counter() - start_time:.2f}s'
+
+            log = clear_log + f"[{'='*(progress-1)}{'>'*min(1, progress)}{'.'*(bar_length-progress)}]" + progress_log + reward_log + \
+            score_log + param_log + time_log + profiler_log + log_end
+            print(log, end='')
+        
+        except Exception:
+            print('Logger Error')
+
+
+    def test(self, env, nb_episodes, nb_max_episode_steps=-1, verbose=1, visualize=True, profiler=None, nb_envs=None):
+        # with nb_envs, a single env is swapped for a pool of that many boards. exactly nb_episodes episodes are started and
+        # boards retire once the quota is used, so long episodes are not cut short by short ones finishing first
+        start_time = time.perf_counter()
+        pool = None
+
+        if nb_envs is not None and not self.is_vectorized(env):
+            pool = VecSnakeEnv(min(nb_envs, nb_episodes))
+            pool.termination_step = env.termination_step
+            assert pool.observation_space.shape == env.observation_space.shape, 'self.test (Agent): env board does not match the pool'
+            env = pool
+
+        episodes = []
+        rewards = []
+        steps = []
+        scores = []
+
+        vectorized = self.is_vectorized(env)
+        nb_envs = env.nb_envs if vectorized else 1
+        visualize = visualize and not vectorized
+
+        episode = 0
+        episode_steps = np.zeros(shape=(nb_envs,), dtype=np.int64)
+        episode_rewards = np.zeros(shape=(nb_envs,), dtype=np.int64)
+        nb_started = min(nb_envs, nb_episodes)
+        active = np.arange(nb_envs) < nb_started
+        actions = np.zeros(shape=(nb_envs,), dtype=np.int64)
+
+        prof = profiler if profiler is not None else NullProfiler()
+        step = 0
+
+        if profiler is not None:
+            profiler.start()
+
+        states = self.reset_env(env)
+
+        while episode < nb_episodes:
+            if visualize:
+                env.render()
+
+            nb_active = np.count_nonzero(active)
+
+            # one forward pass for the boards still playing
+            with prof.phase('select_action'):
+                actions[active] = self.select_actions(states[active])
+
+            with prof.phase('env_step'):
+                next_states, step_rewards, dones, infos = self.step_env(env, actions, None if nb_active == nb_envs else active)
+
+            episode_rewards += step_rewards
+            prof.count_steps(nb_active)
+
+            if profiler is not None and self.interval_reached(step, nb_active, profiler.interval):
+                profiler.report(step)
+
+            step += nb_active
+
+            truncated = (episode_steps == nb_max_episode_steps) & ~dones & active
+            episode_steps[active] += 1
+            finished = dones | truncated
+            episode_scores = self.get_scores(env, dones, infos)
+
+            if np.any(truncated):
+                next_states = self.reset_env(env, truncated)
+
+            for idx in np.flatnonzero(finished):
+                episodes.append(episode)
+                rewards.append(int(episode_rewards[idx]))
+                steps.append(int(episode_steps[idx]))
+                scores.append(int(episode_scores[idx]))
+
+                if verbose == 1:
+                    self.logger(nb_episodes=nb_episodes, episode_nb=episode+1, episode_reward=episode_rewards[idx],
+                    score=episode_scores[idx], start_time=start_time, final_log=False, profiler_log=prof.get_log())
+
+                episode += 1
+                episode_steps[idx] = 0
+                episode_rewards[idx] = 0
+
+                # the board plays on with its next episode until all of them are started
+                if nb_started < nb_episodes:
+                    nb_started += 1
+                else:
+                    active[idx] = False
+
+            states = next_states
+
+        if pool is not None:
+            pool.close()
+
+        if profiler is not None:
+            profiler.report(step)
+            profiler.close()
+        
+        if verbose == 1:
+            self.logger(nb_episodes=nb_episodes, episode_nb=episode, episode_reward=rewards[-1], score=scores[-1],
+            start_time=start_time, final_log=True, profiler_log=prof.get_log())
+        
+        return {'episodes':episodes, 'rewards':rewards, 'steps':steps, 'scores':scores}
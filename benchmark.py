@@ -0,0 +1,240 @@
+from env import SnakeEnv, Point
+from collections import deque
+from monitor import get_rss, get_peak_rss
+import argparse
+import itertools
+import json
+import os
+import platform
+import subprocess
+import numpy as np
+import time
+import tracemalloc
+
+
+def get_cycle(height, width):
+    # hamiltonian cycle over the top-left (height, width) cells, height must be even
+    assert height % 2 == 0, 'get_cycle: height must be even'
+
+    cycle = [Point(0, column) for column in range(width)]
+
+    for row in range(1, height):
+        columns = range(width - 1, 0, -1) if row % 2 == 1 else range(1, width)
+        cycle += [Point(row, column) for column in columns]
+
+    cycle += [Point(row, 0) for row in range(height - 1, 0, -1)]
+    return cycle
+
+
+def set_long_snake(env, cycle, snake_len):
+    # the snake follows the cycle head first, the apple is placed outside of it so the snake never grows
+    env.reset()
+    env.termination_step = np.inf
+    env.snake = deque(cycle[idx] for idx in range(snake_len - 1, -1, -1))
+    env.dir = env.sub_points(env.snake[0], env.snake[1])
+    env.reset_occupancy()
+
+    for point in env.snake:
+        env.occupy(point)
+
+    env.apple = Point(env.height - 1, env.width - 1)
+    env.snake_apple_distance = env.get_snake_apple_manhattan_distance()
+    env.state = env.get_state()
+
+
+def time_calls(function, nb_calls, nb_warmup_calls=10):
+    for _ in range(nb_warmup_calls):
+        function()
+
+    latencies = np.empty(shape=(nb_calls,), dtype=np.float64)
+
+    for idx in range(nb_calls):
+        start_time = time.perf_counter()
+        function()
+        latencies[idx] = time.perf_counter() - start_time
+
+    return latencies
+
+
+def trace_calls(function, nb_calls):
+    # peak of the python and numpy allocations made by the calls, above what was allocated before them. tracing slows
+    # every allocation, so it runs apart from the timed calls. memory tensorflow allocates natively is not traced
+    started_tracing = not tracemalloc.is_tracing()
+
+    if started_tracing:
+        tracemalloc.start()
+
+    traced = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+
+    for _ in range(nb_calls):
+        function()
+
+    peak_traced = tracemalloc.get_traced_memory()[1] - traced
+
+    if started_tracing:
+        tracemalloc.stop()
+
+    return peak_traced
+
+
+def run_benchmark(results, name, function, nb_calls, nb_warmup_calls=10, nb_traced_calls=100, **params):
+    rss = get_rss()
+    latencies = time_calls(function, nb_calls, nb_warmup_calls)
+    rss_delta = get_rss() - rss
+    p50, p90, p99 = np.percentile(latencies, (50, 90, 99)) * 1e6
+
+    record = {'name':name, 'params':params, 'nb_calls':nb_calls, 'calls_per_sec':nb_calls / np.sum(latencies),
+    'mean_us':np.mean(latencies) * 1e6, 'p50_us':p50, 'p90_us':p90, 'p99_us':p99, 'max_us':np.max(latencies) * 1e6,
+    'rss_delta':rss_delta, 'peak_traced':trace_calls(function, min(nb_calls, nb_traced_calls))}
+    results.append(record)
+
+    params_log = ' '.join(f'{key}={value}' for key, value in params.items())
+    print(f"{name:20s} {params_log:24s} {record['calls_per_sec']:10.0f} calls/sec - p50 {p50:9.1f} us - p99 {p99:9.1f} us - "
+    f"peak traced {record['peak_traced'] / 2**10:.0f} KB")
+
+    return record
+
+
+def benchmark_env(results, snake_lengths=(3, 25, 50, 100, 150, 200), nb_calls=10_000):
+    env = SnakeEnv()
+    cycle = get_cycle(env.height - 1, env.width - 1)
+    actions = {direction:action for action,direction in env.action_map.items()}
+    cycle_actions = [actions[env.sub_points(cycle[(idx + 1) % len(cycle)], cycle[idx])] for idx in range(len(cycle))]
+
+    run_benchmark(results, 'env_reset', env.reset, nb_calls)
+
+    for snake_len in snake_lengths:
+        set_long_snake(env, cycle, snake_len)
+        next_actions = itertools.islice(itertools.cycle(cycle_actions), snake_len - 1, None)
+
+        run_benchmark(results, 'env_step', lambda: env.step(next(next_actions)), nb_calls, snake_len=snake_len)
+        assert len(env.snake) == snake_len, 'benchmark_env: snake left the cycle'
+
+        run_benchmark(results, 'env_get_state', env.get_state, nb_calls, snake_len=snake_len)
+
+
+def fill_memory(agent, nb_experiences, chunk_size=10_000):
+    # random 0/1 observations, the memory cost of an experience does not depend on its content
+    state_shape = tuple(agent.state_shape)
+
+    for start in range(0, nb_experiences, chunk_size):
+        nb_chunk = min(chunk_size, nb_experiences - start)
+        states = np.random.randint(0, 2, size=(nb_chunk,) + state_shape, dtype=np.uint8)
+        agent.memory.extend(states, np.random.randint(0, agent.nb_actions, nb_chunk), np.random.uniform(-1, 1, nb_chunk),
+        np.roll(states, 1, axis=0), np.random.uniform(size=nb_chunk) < .05)
+
+
+def benchmark_memory(results, memory_sizes=(1_000, 10_000, 100_000), batch_size=32, nb_calls=10_000):
+    from agent import DQNAgent
+
+    env = SnakeEnv()
+    state_shape = env.observation_space.shape
+    state = env.reset()
+
+    for memory_size, packed in itertools.product(memory_sizes, (False, True)):
+        agent = DQNAgent(state_shape, env.action_space.nb_actions, memory_limit=memory_size, packed_observations=packed)
+        fill_memory(agent, memory_size)
+
+        run_benchmark(results, 'store_experience', lambda: agent.store_experience(state, 0, 1., state, False), nb_calls,
+        memory_size=memory_size, packed=packed)
+        run_benchmark(results, 'get_batch', lambda: agent.get_batch(batch_size), nb_calls // 10, memory_size=memory_size,
+        batch_size=batch_size, packed=packed)
+
+        del agent
+
+
+def benchmark_models(results, model_indices=range(1, 9), batch_size=64, memory_size=10_000, nb_calls=200, fused_train_step=False):
+    import models
+    from agent import DQNAgent
+
+    env = SnakeEnv()
+    state_shape = env.observation_space.shape
+    nb_actions = env.action_space.nb_actions
+    state = env.reset()
+
+    for model_idx in model_indices:
+        build_model = getattr(models, f'build_model_{model_idx}')
+        agent = DQNAgent(state_shape, nb_actions, model=build_model(state_shape, nb_actions),
+        target_model=build_model(state_shape, nb_actions), memory_limit=memory_size, fused_train_step=fused_train_step)
+        fill_memory(agent, memory_size)
+
+        batch_state = agent.preprocess_state(state)
+
+        run_benchmark(results, 'select_action', lambda: agent.select_action(batch_state), nb_calls * 5, model=model_idx)
+        run_benchmark(results, 'replay_experience', lambda: agent.replay_experience(batch_size, 1), nb_calls, model=model_idx,
+        batch_size=batch_size, fused=fused_train_step)
+
+        del agent
+
+
+def get_git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+        cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def get_metadata():
+    import tensorflow as tf
+
+    return {'commit':get_git_commit(), 'time':time.time(), 'python':platform.python_version(), 'numpy':np.__version__,
+    'tensorflow':tf.__version__, 'machine':platform.machine(), 'processor':platform.processor()}
+
+
+def run_suite(output_path='benchmark_results.json', quick=False, fused_train_step=False):
+    # quick runs a tenth of the calls, to check the suite itself rather than to compare numbers
+    scale = 10 if quick else 1
+    results = []
+
+    benchmark_env(results, nb_calls=10_000 // scale)
+    benchmark_memory(results, nb_calls=10_000 // scale)
+    benchmark_models(results, nb_calls=200 // scale, fused_train_step=fused_train_step)
+
+    # the process peak is only known for the whole suite, the records hold the peak of each benchmark
+    metadata = get_metadata()
+    metadata['peak_rss'] = get_peak_rss()
+
+    with open(output_path, 'w') as file:
+        json.dump({'metadata':metadata, 'results':results}, file, indent=1)
+
+    return results
+
+
+def get_result_key(record):
+    return (record['name'],) + tuple(sorted(record['params'].items()))
+
+
+def compare_results(base_path, new_path, metric='p50_us'):
+    # ratio of new to base latency for every benchmark both files hold, above 1 is a slowdown
+    with open(base_path) as file:
+        base = {get_result_key(record):record for record in json.load(file)['results']}
+
+    with open(new_path) as file:
+        new = {get_result_key(record):record for record in json.load(file)['results']}
+
+    ratios = {}
+
+    for key in base:
+        if key in new:
+            ratios[key] = new[key][metric] / base[key][metric]
+            params_log = ' '.join(f'{name}={value}' for name, value in key[1:])
+            print(f'{key[0]:20s} {params_log:24s} {base[key][metric]:10.1f} -> {new[key][metric]:10.1f} {metric} - x{ratios[key]:.2f}')
+
+    return ratios
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--quick', action='store_true')
+    parser.add_argument('--fused-train-step', action='store_true')
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NEW'))
+    args = parser.parse_args()
+
+    if args.compare is not None:
+        compare_results(*args.compare)
+    else:
+        run_suite(args.output, quick=args.quick, fused_train_step=args.fused_train_step)
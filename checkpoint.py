@@ -0,0 +1,183 @@
+import json
+import os
+import pickle
+import random
+import shutil
+import numpy as np
+
+
+def write_array(path, array, chunk_bytes=64 * 2**20):
+    # .npy file written in chunks straight from the array buffer, without building the whole file in memory
+    with open(path, 'wb') as file:
+        np.lib.format.write_array_header_2_0(file, np.lib.format.header_data_from_array_1_0(array))
+
+        row_bytes = max(1, array[:1].nbytes)
+        chunk_rows = max(1, chunk_bytes // row_bytes)
+
+        for start in range(0, len(array), chunk_rows):
+            file.write(np.ascontiguousarray(array[start:start + chunk_rows]).data)
+
+        file.flush()
+        os.fsync(file.fileno())
+
+
+def read_array(path, target, chunk_bytes=64 * 2**20):
+    # copies a .npy file into the first rows of a preallocated array through a memory map, chunk by chunk
+    source = np.load(path, mmap_mode='r')
+    assert source.shape[1:] == target.shape[1:] and len(source) <= len(target), f'read_array: {path} does not fit its target'
+
+    chunk_rows = max(1, chunk_bytes // max(1, source[:1].nbytes))
+
+    for start in range(0, len(source), chunk_rows):
+        stop = min(start + chunk_rows, len(source))
+        target[start:stop] = source[start:stop]
+
+    return len(source)
+
+
+def get_optimizer_variables(optimizer):
+    return optimizer.variables() if callable(optimizer.variables) else optimizer.variables
+
+
+def write_json(path, data):
+    with open(path, 'w') as file:
+        json.dump(data, file)
+        file.flush()
+        os.fsync(file.fileno())
+
+
+def write_pickle(path, data):
+    with open(path, 'wb') as file:
+        pickle.dump(data, file, pickle.HIGHEST_PROTOCOL)
+        file.flush()
+        os.fsync(file.fileno())
+
+
+class CheckpointManager():
+    # every checkpoint is a directory written under a temporary name and renamed into place once complete, so a crash
+    # mid-save never leaves a partial checkpoint behind. only the keep_last newest checkpoints are kept
+    def __init__(self, directory='checkpoints', keep_last=3, checkpoint_steps=100_000):
+        assert keep_last > 0, 'keep_last must be positive'
+
+        self.directory = directory
+        self.keep_last = keep_last
+        self.checkpoint_steps = checkpoint_steps
+        self.prefix = 'ckpt-'
+        self.tmp_prefix = 'tmp-'
+
+
+    def get_checkpoints(self):
+        if not os.path.isdir(self.directory):
+            return []
+
+        names = [name for name in os.listdir(self.directory) if name.startswith(self.prefix)]
+        return [os.path.join(self.directory, name) for name in sorted(names)]
+
+
+    def latest(self):
+        checkpoints = self.get_checkpoints()
+        return checkpoints[-1] if len(checkpoints) > 0 else None
+
+
+    def save(self, agent, step, fit_state, history):
+        os.makedirs(self.directory, exist_ok=True)
+
+        name = f'{self.prefix}{step:012d}'
+        path = os.path.join(self.directory, name)
+        tmp_path = os.path.join(self.directory, self.tmp_prefix + name)
+
+        if os.path.exists(tmp_path):
+            shutil.rmtree(tmp_path)
+
+        os.makedirs(os.path.join(tmp_path, 'memory'))
+
+        memory = agent.memory
+        memory_attributes = memory.get_attributes()
+
+        # slot arrays are only written up to the memory size, other arrays (e.g. the priorities tree) are written whole
+        for array_name, array in memory.get_arrays().items():
+            rows = memory.size if len(array) == memory.limit else len(array)
+            write_array(os.path.join(tmp_path, 'memory', array_name + '.npy'), array[:rows])
+
+        for model_name, model in (('model', agent.model), ('target_model', agent.target_model)):
+            for idx, weights in enumerate(model.get_weights()):
+                write_array(os.path.join(tmp_path, f'{model_name}-{idx}.npy'), np.atleast_1d(weights))
+
+        for history_name, values in history.items():
+            write_array(os.path.join(tmp_path, f'history-{history_name}.npy'), np.asarray(values))
+
+        optimizer_variables = get_optimizer_variables(agent.model.optimizer)
+
+        for idx, variable in enumerate(optimizer_variables):
+            write_array(os.path.join(tmp_path, f'optimizer-{idx}.npy'), np.atleast_1d(np.asarray(variable)))
+
+        write_json(os.path.join(tmp_path, 'state.json'), {'step':step, 'eps':agent.eps, 'memory_type':type(memory).__name__,
+        'memory_attributes':memory_attributes, 'nb_model_weights':len(agent.model.get_weights()),
+        'nb_optimizer_variables':len(optimizer_variables), 'history':list(history), 'fit_state':fit_state})
+
+        write_pickle(os.path.join(tmp_path, 'random_state.pkl'), {'numpy':np.random.get_state(), 'random':random.getstate()})
+
+        if os.path.exists(path):
+            shutil.rmtree(path)
+
+        os.replace(tmp_path, path)
+        self.rotate()
+
+        return path
+
+
+    def rotate(self):
+        for path in self.get_checkpoints()[:-self.keep_last]:
+            shutil.rmtree(path)
+
+
+    def restore(self, agent, path=None):
+        path = self.latest() if path is None else path
+
+        if path is None:
+            return None, None
+
+        with open(os.path.join(path, 'state.json')) as file:
+            state = json.load(file)
+
+        memory = agent.memory
+
+        if state['memory_type'] != type(memory).__name__:
+            raise Exception(f"self.restore (CheckpointManager): checkpoint holds a {state['memory_type']}, agent has a "
+            f"{type(memory).__name__}")
+
+        memory.set_attributes(state['memory_attributes'])
+
+        for array_name, array in memory.get_arrays().items():
+            read_array(os.path.join(path, 'memory', array_name + '.npy'), array)
+
+        for model_name, model in (('model', agent.model), ('target_model', agent.target_model)):
+            weights = model.get_weights()
+            weights = [np.load(os.path.join(path, f'{model_name}-{idx}.npy')).reshape(np.shape(weights[idx]))
+            for idx in range(state['nb_model_weights'])]
+            model.set_weights(weights)
+
+        optimizer = agent.model.optimizer
+        optimizer_variables = get_optimizer_variables(optimizer)
+
+        # optimizers create their slots on the first update, a fresh agent has to build them before they can be assigned
+        if len(optimizer_variables) != state['nb_optimizer_variables'] and hasattr(optimizer, 'build'):
+            optimizer.build(agent.model.trainable_variables)
+            optimizer_variables = get_optimizer_variables(optimizer)
+
+        if len(optimizer_variables) != state['nb_optimizer_variables']:
+            raise Exception('self.restore (CheckpointManager): optimizer state does not match the model')
+
+        for idx, variable in enumerate(optimizer_variables):
+            variable.assign(np.load(os.path.join(path, f'optimizer-{idx}.npy')).reshape(variable.shape))
+
+        with open(os.path.join(path, 'random_state.pkl'), 'rb') as file:
+            random_state = pickle.load(file)
+
+        np.random.set_state(random_state['numpy'])
+        random.setstate(random_state['random'])
+
+        history = {history_name:np.load(os.path.join(path, f'history-{history_name}.npy')).tolist() for history_name in state['history']}
+
+        agent.eps = state['eps']
+        return state['fit_state'], history
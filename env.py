@@ -1,5 +1,5 @@
-from gui import SnakeGUI
 from collections import namedtuple, deque
+import math
 import numpy as np
 
 
@@ -28,9 +28,22 @@ class ObservationSpace():
         self.dtype = None if dtype is None else np.dtype(dtype)
 
 
+def get_packed_shape(observation_shape):
+    return ((math.prod(observation_shape) + 7) // 8,)
+
+
+def pack_observations(observations, observation_shape):
+    # observations only hold 0/1 values, packed they take one bit per value instead of one byte
+    return np.packbits(np.reshape(observations, (-1, math.prod(observation_shape))), axis=1)
+
+
+def unpack_observations(packed_observations, observation_shape):
+    return np.unpackbits(packed_observations, axis=1, count=math.prod(observation_shape)).reshape((-1,) + tuple(observation_shape))
+
+
 class SnakeEnv():
 
-    def __init__(self):
+    def __init__(self, copy_state=True):
         # board attributes
         self.height = 15
         self.width = 17
@@ -40,6 +53,13 @@ class SnakeEnv():
         self.apple = None
         self.last_tail = None
         self.dir = None
+        self.occupancy = np.zeros(shape=(self.height, self.width), dtype=np.int64) # snake segments per cell
+
+        # free cells - flat indices of the unoccupied cells are kept in the first nb_free_cells slots of free_cells, and
+        # free_cell_positions maps a cell to its slot so it can be swap-removed
+        self.free_cells = np.arange(self.height * self.width)
+        self.free_cell_positions = np.arange(self.height * self.width)
+        self.nb_free_cells = self.height * self.width
         self.snake_starting_len = 3
         self.head_starting_point = Point(self.height//2, self.width//2)
         
@@ -56,8 +76,10 @@ class SnakeEnv():
         self.action_map = {self.action_right:Point(0, 1), self.action_left:Point(0, -1), self.action_up:Point(-1, 0),
         self.action_down:Point(1, 0)}
 
-        # state attributes
+        # state attributes - the state is built on reset and then updated in place, with copy_state=False observations
+        # are read-only views that the next step overwrites
         self.state = None
+        self.copy_state = copy_state
         self.nb_layers = 3
         self.body_layer = 0
         self.head_layer = 1
@@ -80,8 +102,9 @@ class SnakeEnv():
         # dqn attributes
         self.snake_apple_distance = None
 
-        # gui
-        self.gui = SnakeGUI(self, include_timer=True)
+        # gui - created on the first render, so envs that are never rendered do not load pygame
+        self.gui = None
+        self.gui_include_timer = True
 
         # no progress termination
         self.termination_step = 300
@@ -140,23 +163,65 @@ class SnakeEnv():
     def is_snake_occupying(self, point, include_head=True):
         assert self.snake is not None, 'self.is_snake_occupying (SnakeEnv): snake must not be None'
 
-        for idx,_point in enumerate(self.snake):
-            if idx == self.head_index:
-                if include_head and point == _point:
-                    return True
-            
-            else:
-                if point == _point:
-                    return True
-        
-        return False
+        if not self.in_bounds(point):
+            return False
+
+        nb_segments = self.occupancy[point.row, point.column]
+
+        if not include_head and point == self.snake[self.head_index]:
+            nb_segments -= 1
+
+        return nb_segments > 0
+
+
+    def occupy(self, point, nb_segments=1):
+        if not self.in_bounds(point):
+            return
+
+        prev_nb_segments = self.occupancy[point.row, point.column]
+        self.occupancy[point.row, point.column] += nb_segments
+
+        if prev_nb_segments == 0:
+            self.remove_free_cell(point.row * self.width + point.column)
+        elif prev_nb_segments + nb_segments == 0:
+            self.add_free_cell(point.row * self.width + point.column)
+
+
+    def remove_free_cell(self, cell):
+        position = self.free_cell_positions[cell]
+        last_cell = self.free_cells[self.nb_free_cells - 1]
+
+        self.free_cells[position] = last_cell
+        self.free_cell_positions[last_cell] = position
+        self.free_cells[self.nb_free_cells - 1] = cell
+        self.free_cell_positions[cell] = self.nb_free_cells - 1
+        self.nb_free_cells -= 1
+
+
+    def add_free_cell(self, cell):
+        position = self.free_cell_positions[cell]
+        first_taken_cell = self.free_cells[self.nb_free_cells]
+
+        self.free_cells[position] = first_taken_cell
+        self.free_cell_positions[first_taken_cell] = position
+        self.free_cells[self.nb_free_cells] = cell
+        self.free_cell_positions[cell] = self.nb_free_cells
+        self.nb_free_cells += 1
+
+
+    def reset_occupancy(self):
+        self.occupancy.fill(0)
+        self.free_cells = np.arange(self.height * self.width)
+        self.free_cell_positions = np.arange(self.height * self.width)
+        self.nb_free_cells = self.height * self.width
 
 
     def randomize_apple(self):
         assert self.apple is None, 'self.randomize_apple (SnakeEnv): apple is not None'
+        assert self.nb_free_cells > 0, 'self.randomize_apple (SnakeEnv): board is full'
 
-        while self.apple is None or self.is_snake_occupying(self.apple):
-            self.apple = Point(np.random.randint(0, self.height), np.random.randint(0, self.width))
+        cell = self.free_cells[np.random.randint(0, self.nb_free_cells)]
+        self.apple = Point(int(cell // self.width), int(cell % self.width))
 
     
     def get_state(self):
@@ -178,14 +243,30 @@ class SnakeEnv():
         return state
 
 
+    def set_state_cell(self, point, layer, value):
+        if self.in_bounds(point):
+            self.state[point.row, point.column, layer] = value
+
+
+    def get_observation(self):
+        if self.copy_state:
+            return np.copy(self.state)
+
+        observation = self.state.view()
+        observation.flags.writeable = False
+        return observation
+
+
     def init_snake(self):
         self.snake = deque()
+        self.reset_occupancy()
 
         assert self.dir is not None, 'self.init_snake (SnakeEnv): dir must not be None'
 
         spawn_dir = self.negate_point(self.dir)
         last_point = self.copy_point(self.head_starting_point)
         self.snake.append(last_point)
+        self.occupy(last_point)
 
         spawning_attemps = 0
 
@@ -202,11 +283,14 @@ class SnakeEnv():
                 point = self.add_points(last_point, spawn_dir)
 
             self.snake.append(point)
+            self.occupy(point)
             last_point = point
 
 
     def reset(self):
-        self.gui.reset()
+        if self.gui is not None:
+            self.gui.reset()
+
         self.no_progress_step_nb = 0
         self.curr_score = 0
         self.snake = None
@@ -219,9 +303,8 @@ class SnakeEnv():
         self.randomize_apple()
         self.snake_apple_distance = self.get_snake_apple_manhattan_distance()
         self.state = self.get_state()
-        
 
-        return np.copy(self.state)
+        return self.get_observation()
 
 
     def is_board_full(self):
@@ -242,20 +325,10 @@ class SnakeEnv():
             raise Exception('self.update_dir (SnakeEnv): invalid action')
 
 
-    def get_next_snake(self):
-        snake = deque()
-
-        last_point = self.snake[self.head_index]
-        snake.append(self.add_points(last_point, self.dir))
-
-        for idx in range(len(self.snake)):
-            if idx == self.head_index:
-                continue
-            
-            snake.append(last_point)
-            last_point = self.snake[idx]
-        
-        return snake, last_point
+    def move_snake(self):
+        # push the new head and pop the tail - growing snakes get the tail back through spawn_tail
+        self.snake.appendleft(self.add_points(self.snake[self.head_index], self.dir))
+        return self.snake.pop()
 
 
     def is_eating_apple(self):
@@ -269,6 +342,8 @@ class SnakeEnv():
     def spawn_tail(self):
         assert self.last_tail is not None, 'self.spawn_tail (SnakeEnv): last tail is None - invalid'
         self.snake.append(self.last_tail)
+        self.occupy(self.last_tail)
+        self.set_state_cell(self.last_tail, self.body_layer, 1)
         self.last_tail = None
     
 
@@ -280,7 +355,15 @@ class SnakeEnv():
         event_idx = 0
 
         self.update_dir(action)
-        self.snake, self.last_tail = self.get_next_snake()
+        self.last_tail = self.move_snake()
+        self.occupy(self.snake[self.head_index])
+        self.occupy(self.last_tail, -1)
+
+        # only the old head, the freed tail and the new head change
+        self.set_state_cell(self.snake[self.head_index + 1], self.head_layer, 0)
+        self.set_state_cell(self.snake[self.head_index + 1], self.body_layer, 1)
+        self.set_state_cell(self.last_tail, self.body_layer, 0)
+        self.set_state_cell(self.snake[self.head_index], self.head_layer, 1)
 
         if self.is_eating_apple():
             self.no_progress_step_nb = 0
@@ -290,6 +373,7 @@ class SnakeEnv():
             
             reward += self.get_reward(self.eating_apple_code)
                        
+            self.set_state_cell(self.apple, self.apple_layer, 0)
             self.apple = None
             self.spawn_tail()
 
@@ -300,6 +384,7 @@ class SnakeEnv():
                 reward += self.get_reward(self.winning_game_code)
             else:
                 self.randomize_apple()
+                self.set_state_cell(self.apple, self.apple_layer, 1)
 
         else:
             if self.is_game_over():
@@ -328,15 +413,22 @@ class SnakeEnv():
         
 
         self.snake_apple_distance = self.get_snake_apple_manhattan_distance()
-        self.state = self.get_state()
-        return np.copy(self.state), reward, done, info
+        return self.get_observation(), reward, done, info
+
+
+    def init_gui(self):
+        from gui import SnakeGUI
+        self.gui = SnakeGUI(self, include_timer=self.gui_include_timer)
 
 
     def render(self, mode='human', user_control=False):
-        assert self.gui is not None, 'self.render (SnakeEnv): gui must not be None'
+        if self.gui is None:
+            self.init_gui()
+
         return self.gui.render(mode, user_control)
     
 
     def close(self):
-        assert self.gui is not None, 'self.close (SnakeEnv): gui must not be None'
-        self.gui.close()
\ No newline at end of file
+        if self.gui is not None:
+            self.gui.close()
+            self.gui = None
\ No newline at end of file
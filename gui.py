@@ -42,6 +42,14 @@ class SnakeGUI():
         self.window = None
         self.env = env
 
+        # drawing state - the board is drawn once on a cached background, then only the cells and texts that changed are
+        # redrawn and pushed to the display
+        self.background = None
+        self.drawn_cells = {}
+        self.drawn_scores = None
+        self.score_texts = {}
+        self.dirty_rects = []
+
     
     def render(self, mode, user_control):
         if self.include_timer and self.timer is not None:
@@ -52,12 +60,17 @@ class SnakeGUI():
         
         if self.window is None:
             self.window = pygame.display.set_mode((self.window_width, self.window_height))
+            self.background = self.build_background(self.env.width, self.env.height)
+            self.window.blit(self.background, (0, 0))
+
+            self.drawn_cells = {}
+            self.drawn_scores = None
+            self.dirty_rects = [self.window.get_rect()]
         
-        self.draw_background(self.env.width, self.env.height)
-        self.draw_snake(self.env.snake)
-        self.draw_apple(self.env.apple)
+        self.draw_cells(self.get_cells(self.env.snake, self.env.apple))
         self.draw_scores(self.env.best_score, self.env.curr_score)
-        pygame.display.update()
+        pygame.display.update(self.dirty_rects)
+        self.dirty_rects = []
 
 
         user_actions = []
@@ -96,49 +109,95 @@ class SnakeGUI():
 
 
     
-    def draw_background(self, board_width, board_height):
-        assert self.window is not None, 'self.draw_background (SnakeGUI): window must not be None'
-        
+    def build_background(self, board_width, board_height):
+        background = pygame.Surface((self.window_width, self.window_height))
+        background.fill(self.background_color)
+
         for row in range(board_height):
             for column in range(board_width):
-                pygame.draw.rect(self.window, self.board_colors[(row+column)%2],
+                pygame.draw.rect(background, self.board_colors[(row+column)%2],
                 [column*self.square_len, row*self.square_len, self.square_len, self.square_len])
 
+        return background
+
+
+    def get_cell_rect(self, point):
+        return pygame.Rect(point.column*self.square_len, point.row*self.square_len, self.square_len, self.square_len)
+
+
+    def get_cells(self, snake, apple):
+        assert snake is not None, 'self.get_cells (SnakeGUI): snake must not be None'
+        assert apple is not None, 'self.get_cells (SnakeGUI): apple must not be None'
+
+        cells = {}
+        color = self.snake_head_color
+
+        for point in snake:
+            # a head that left the board is not drawn, it would land on the score bar
+            if 0 <= point.row < self.env.height and 0 <= point.column < self.env.width:
+                cells.setdefault(point, color)
+
+            color = self.snake_body_color
+
+        # the apple is drawn over the snake
+        cells[apple] = self.apple_color
+        return cells
+
+
+    def draw_cells(self, cells):
+        assert self.window is not None, 'self.draw_cells (SnakeGUI): window must not be None'
+
+        # cells that were left are restored from the background
+        for point in self.drawn_cells.keys() - cells.keys():
+            rect = self.get_cell_rect(point)
+            self.window.blit(self.background, rect, rect)
+            self.dirty_rects.append(rect)
+
+        for point, color in cells.items():
+            if self.drawn_cells.get(point) == color:
+                continue
+
+            rect = self.get_cell_rect(point)
+            pygame.draw.rect(self.window, color, rect)
+
+            if color != self.apple_color:
+                pygame.draw.rect(self.window, self.snake_border_color, rect, width=1)
+
+            self.dirty_rects.append(rect)
+
+        self.drawn_cells = cells
+
+
+    def get_score_text(self, label, score):
+        # texts are rendered again only when their score changes
+        score_text = self.score_texts.get(label)
+
+        if score_text is None or score_text[0] != score:
+            score_text = (score, self.font.render(f'{label}: {score}', False, self.scores_color))
+            self.score_texts[label] = score_text
+
+        return score_text[1]
+
 
     def draw_scores(self, best_score, curr_score):
         assert self.window is not None, 'self.draw_scores (SnakeGUI): window must not be None'
 
-        best_score_text = self.font.render(f'Best Score: {best_score}', False, self.scores_color)
-        curr_score_text = self.font.render(f'Current Score: {curr_score}', False, self.scores_color)
+        if self.drawn_scores == (best_score, curr_score):
+            return
+
+        best_score_text = self.get_score_text('Best Score', best_score)
+        curr_score_text = self.get_score_text('Current Score', curr_score)
 
         text_size = curr_score_text.get_rect()
         text_y_gap = int(self.text_height / 2 - text_size.height / 2)
 
-        pygame.draw.rect(self.window, self.background_color, [0, self.board_height, self.window_width, self.text_height])
+        rect = pygame.Rect(0, self.board_height, self.window_width, self.text_height)
+        self.window.blit(self.background, rect, rect)
         self.window.blit(best_score_text, (self.text_x_gap, self.board_height + text_y_gap))
         self.window.blit(curr_score_text, (self.window_width - self.text_x_gap - text_size.width, self.board_height + text_y_gap))
 
- 
-    def draw_snake(self, snake):
-        assert snake is not None, 'self.draw_snake (SnakeGUI): snake must not be None'
-        assert self.window is not None, 'self.draw_snake (SnakeGUI): window must not be None'
-
-        color = self.snake_head_color        
-
-        for point in snake:
-            x_draw, y_draw = point.column*self.square_len, point.row*self.square_len
-            pygame.draw.rect(self.window, color, [int(x_draw), int(y_draw), self.square_len, self.square_len])
-            pygame.draw.rect(self.window, self.snake_border_color, [int(x_draw), int(y_draw), self.square_len, self.square_len], width=1)
-            
-            color = self.snake_body_color
-    
-
-    def draw_apple(self, apple):
-        assert apple is not None, 'self.draw_apple (SnakeGUI): apple must not be None'
-        assert self.window is not None, 'self.draw_apple (SnakeGUI): window must not be None'
-
-        pygame.draw.rect(self.window, self.apple_color, [apple.column*self.square_len, apple.row*self.square_len, self.square_len,
-        self.square_len])
+        self.dirty_rects.append(rect)
+        self.drawn_scores = (best_score, curr_score)
 
 
     def reset(self):
@@ -150,3 +209,4 @@ class SnakeGUI():
         pygame.quit()
         self.window = None
         self.timer = None
+        self.background = None
@@ -0,0 +1,151 @@
+import os
+import re
+import time
+import numpy as np
+
+
+class HistoryWriter():
+    # rows of every stream (e.g. 'episodes', 'validation') are buffered and written as numbered .npz chunks of columns, so
+    # memory stays bounded and readers can load a live run. chunks are renamed into place once complete
+    def __init__(self, directory, chunk_size=10_000, flush_seconds=60.):
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.flush_seconds = flush_seconds
+
+        self.buffers = {}
+        self.nb_chunks = {}
+        self.nb_rows = {}
+        self.flush_time = time.perf_counter()
+
+        os.makedirs(directory, exist_ok=True)
+
+        # an existing directory is appended to
+        for stream, chunk_paths in get_chunks(directory).items():
+            self.nb_chunks[stream] = int(re.search(r'(\d+)\.npz$', chunk_paths[-1]).group(1)) + 1
+            self.nb_rows[stream] = sum(get_chunk_len(path) for path in chunk_paths)
+
+
+    def append(self, stream, **columns):
+        if stream not in self.buffers:
+            self.buffers[stream] = {name:[] for name in columns}
+
+        buffer = self.buffers[stream]
+
+        for name, value in columns.items():
+            buffer[name].append(value)
+
+        self.nb_rows[stream] = self.nb_rows.get(stream, 0) + 1
+
+        if len(next(iter(buffer.values()))) >= self.chunk_size or time.perf_counter() - self.flush_time >= self.flush_seconds:
+            self.flush()
+
+
+    def write_columns(self, stream, chunk_idx, columns):
+        # written under a temporary name first, so a crash never leaves a partial chunk behind
+        path = os.path.join(self.directory, f'{stream}-{chunk_idx:06d}.npz')
+        tmp_path = os.path.join(self.directory, f'tmp-{stream}-{chunk_idx:06d}.npz')
+
+        with open(tmp_path, 'wb') as file:
+            np.savez(file, **{name:np.asarray(values) for name, values in columns.items()})
+
+        os.replace(tmp_path, path)
+
+
+    def write_chunk(self, stream, columns):
+        chunk_idx = self.nb_chunks.get(stream, 0)
+        self.write_columns(stream, chunk_idx, columns)
+        self.nb_chunks[stream] = chunk_idx + 1
+
+
+    def flush(self):
+        for stream, buffer in self.buffers.items():
+            if len(next(iter(buffer.values()))) > 0:
+                self.write_chunk(stream, buffer)
+                self.buffers[stream] = {name:[] for name in buffer}
+
+        self.flush_time = time.perf_counter()
+
+
+    def get_state(self):
+        return dict(self.nb_rows)
+
+
+    def truncate(self, nb_rows):
+        # drops the rows written after a checkpoint, so a resumed run does not log them twice
+        self.flush()
+
+        for stream, chunk_paths in get_chunks(self.directory).items():
+            remaining = nb_rows.get(stream, 0)
+
+            for path in chunk_paths:
+                chunk_len = get_chunk_len(path)
+
+                if remaining >= chunk_len:
+                    remaining -= chunk_len
+                    continue
+
+                if remaining == 0:
+                    os.remove(path)
+                    continue
+
+                with np.load(path) as chunk:
+                    columns = {name:chunk[name][:remaining] for name in chunk.files}
+
+                self.write_columns(stream, int(re.search(r'(\d+)\.npz$', path).group(1)), columns)
+
+                remaining = 0
+
+            self.nb_rows[stream] = nb_rows.get(stream, 0)
+            chunk_paths = get_chunks(self.directory).get(stream, [])
+            self.nb_chunks[stream] = int(re.search(r'(\d+)\.npz$', chunk_paths[-1]).group(1)) + 1 if chunk_paths else 0
+
+
+    def close(self):
+        self.flush()
+
+
+def get_chunks(directory):
+    chunks = {}
+
+    if not os.path.isdir(directory):
+        return chunks
+
+    for name in sorted(os.listdir(directory)):
+        match = re.fullmatch(r'(\w+?)-(\d+)\.npz', name)
+
+        if match is not None and not name.startswith('tmp-'):
+            chunks.setdefault(match.group(1), []).append(os.path.join(directory, name))
+
+    return chunks
+
+
+def get_chunk_len(path):
+    with np.load(path) as chunk:
+        return len(chunk[chunk.files[0]])
+
+
+def load_history(directory, stream, bin_size=1):
+    # loads a stream chunk by chunk, averaging every bin_size consecutive rows so memory scales with the number of bins.
+    # a trailing partial bin is averaged over the rows it has
+    columns = {}
+    carry = None
+
+    for path in get_chunks(directory).get(stream, []):
+        with np.load(path) as chunk:
+            values = {name:chunk[name].astype(np.float64) for name in chunk.files}
+
+        if carry is not None:
+            values = {name:np.concatenate([carry[name], values[name]]) for name in values}
+
+        nb_full = len(next(iter(values.values()))) // bin_size * bin_size
+
+        for name, column in values.items():
+            columns.setdefault(name, []).append(column[:nb_full].reshape(-1, bin_size).mean(axis=1))
+
+        carry = {name:column[nb_full:] for name, column in values.items()}
+
+    if carry is not None and len(next(iter(carry.values()))) > 0:
+        for name, column in carry.items():
+            columns[name].append(column.mean(keepdims=True))
+
+    return {name:np.concatenate(parts) for name, parts in columns.items()}
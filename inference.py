@@ -0,0 +1,145 @@
+import json
+import numpy as np
+from base_agent import Agent
+
+
+def export_model(model, filepath):
+    # layer configs go in as a json string next to the weights, so the file can be loaded without keras
+    layers = []
+    arrays = {}
+
+    for layer in model.layers:
+        layer_type = type(layer).__name__
+        config = layer.get_config()
+
+        if layer_type == 'InputLayer':
+            continue
+
+        if layer_type == 'Conv2D':
+            assert config['padding'] == 'valid' and tuple(config['dilation_rate']) == (1, 1) and \
+            config.get('data_format', 'channels_last') == 'channels_last', \
+            f"export_model: {layer.name} must use valid padding, no dilation and channels last"
+
+            spec = {'strides':list(config['strides']), 'activation':config['activation']}
+
+        elif layer_type == 'Dense':
+            spec = {'activation':config['activation']}
+
+        elif layer_type == 'Activation':
+            spec = {'activation':config['activation']}
+
+        elif layer_type == 'BatchNormalization':
+            axis = config['axis'][0] if isinstance(config['axis'], (list, tuple)) else config['axis']
+            assert axis in (-1, len(layer.input.shape) - 1), f'export_model: {layer.name} must normalize the last axis'
+
+            spec = {'epsilon':config['epsilon'], 'center':config['center'], 'scale':config['scale']}
+
+        elif layer_type == 'Flatten':
+            spec = {}
+
+        else:
+            raise Exception(f'export_model: {layer_type} layers are not supported')
+
+        spec.update(type=layer_type, nb_weights=len(layer.get_weights()))
+        layers.append(spec)
+
+        for idx, weights in enumerate(layer.get_weights()):
+            arrays[f'{len(layers) - 1}-{idx}'] = weights.astype(np.float32)
+
+    np.savez(filepath, layers=np.array(json.dumps(layers)), **arrays)
+
+
+def apply_activation(x, activation):
+    if activation == 'relu':
+        return np.maximum(x, 0, out=x)
+
+    if activation != 'linear':
+        raise Exception(f'apply_activation: {activation} activation is not supported')
+
+    return x
+
+
+def conv2d(x, kernel, bias, strides):
+    # valid convolution as one tensordot over the (height, width, channels) windows of the input
+    kernel_height, kernel_width = kernel.shape[:2]
+    windows = np.lib.stride_tricks.sliding_window_view(x, (kernel_height, kernel_width), axis=(1, 2))
+    windows = windows[:, ::strides[0], ::strides[1]]
+    y = np.tensordot(windows, kernel, axes=([3, 4, 5], [2, 0, 1]))
+
+    return y + bias if bias is not None else y
+
+
+class NumpyModel():
+    # forward pass of a model written by export_model, the layers models.py builds are covered. batch normalization uses
+    # its moving statistics, as keras does at inference
+    def __init__(self, filepath):
+        with np.load(filepath) as file:
+            self.layers = json.loads(str(file['layers']))
+            self.weights = [[file[f'{idx}-{weights_idx}'] for weights_idx in range(layer['nb_weights'])]
+            for idx, layer in enumerate(self.layers)]
+
+        # batch normalization folds into one scale and offset
+        for layer, weights in zip(self.layers, self.weights):
+            if layer['type'] == 'BatchNormalization':
+                weights = list(weights)
+                gamma = weights.pop(0) if layer['scale'] else 1.
+                beta = weights.pop(0) if layer['center'] else 0.
+                moving_mean, moving_variance = weights
+
+                layer['multiplier'] = (gamma / np.sqrt(moving_variance + layer['epsilon'])).astype(np.float32)
+                layer['offset'] = (beta - moving_mean * layer['multiplier']).astype(np.float32)
+
+
+    def predict(self, x):
+        x = np.asarray(x, dtype=np.float32)
+
+        for layer, weights in zip(self.layers, self.weights):
+            layer_type = layer['type']
+
+            if layer_type == 'Conv2D':
+                x = apply_activation(conv2d(x, weights[0], weights[1] if len(weights) > 1 else None, layer['strides']),
+                layer['activation'])
+
+            elif layer_type == 'Dense':
+                x = x @ weights[0]
+
+                if len(weights) > 1:
+                    x += weights[1]
+
+                x = apply_activation(x, layer['activation'])
+
+            elif layer_type == 'Activation':
+                x = apply_activation(np.array(x), layer['activation'])
+
+            elif layer_type == 'BatchNormalization':
+                x = x * layer['multiplier'] + layer['offset']
+
+            elif layer_type == 'Flatten':
+                x = np.reshape(x, (len(x), -1))
+
+        return x
+
+
+class NumpyAgent(Agent):
+    # plays and tests with an exported model without importing tensorflow
+    def __init__(self, state_shape, nb_actions, filepath, eps=0.):
+        super().__init__(state_shape, nb_actions, eps)
+        self.model = NumpyModel(filepath)
+
+
+    def get_greedy_actions(self, states):
+        return np.argmax(self.model.predict(states), axis=1)
+
+
+def check_parity(model, filepath, nb_states=256, atol=1e-4):
+    # exports a keras model and compares both forward passes on random 0/1 states, returns the largest difference
+    export_model(model, filepath)
+    numpy_model = NumpyModel(filepath)
+
+    states = np.random.randint(0, 2, size=(nb_states,) + tuple(model.input_shape[1:])).astype(np.float32)
+    max_diff = float(np.max(np.abs(numpy_model.predict(states) - np.asarray(model.predict_on_batch(states)))))
+
+    if max_diff > atol:
+        raise Exception(f'check_parity: outputs differ by {max_diff}')
+
+    return max_diff
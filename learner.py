@@ -0,0 +1,75 @@
+import threading
+
+
+class BackgroundLearner():
+    # runs DQNAgent.train on its own thread. fit requests one update per train interval and waits once more than
+    # max_pending_updates are queued, so the replay ratio stays fixed even when training is slower than acting
+    def __init__(self, agent, batch_size, gradient_steps=1, max_pending_updates=2):
+        self.agent = agent
+        self.batch_size = batch_size
+        self.gradient_steps = gradient_steps
+        self.max_pending_updates = max_pending_updates
+
+        self.condition = threading.Condition()
+        self.pending_updates = []
+        self.stopped = False
+        self.error = None
+        self.thread = None
+
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+
+    def run(self):
+        try:
+            while True:
+                with self.condition:
+                    while not self.pending_updates and not self.stopped:
+                        self.condition.wait()
+
+                    if not self.pending_updates:
+                        return
+
+                    nb_steps = self.pending_updates[0]
+
+                self.agent.train(self.batch_size, self.gradient_steps, nb_steps)
+
+                with self.condition:
+                    self.pending_updates.pop(0)
+                    self.condition.notify_all()
+
+        except Exception as error:
+            with self.condition:
+                self.error = error
+                self.pending_updates.clear()
+                self.condition.notify_all()
+
+
+    def check_error(self):
+        if self.error is not None:
+            raise Exception('self.check_error (BackgroundLearner): training thread failed') from self.error
+
+
+    def request_update(self, nb_steps):
+        with self.condition:
+            while len(self.pending_updates) >= self.max_pending_updates and self.error is None:
+                self.condition.wait()
+
+            self.check_error()
+            self.pending_updates.append(nb_steps)
+            self.condition.notify_all()
+
+
+    def close(self):
+        # queued updates still run before the thread exits
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+        self.check_error()
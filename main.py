@@ -2,7 +2,7 @@ import os
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3' 
 
 from env import SnakeEnv
-from agent import DQNAgent
+from inference import NumpyAgent
 
 
 def main():
@@ -12,22 +12,22 @@ def main():
     state_shape = env.observation_space.shape
     nb_actions = env.action_space.nb_actions
 
-    agent = DQNAgent(state_shape, nb_actions)
-    weights_path = 'model_weights.h5'
-    weights_loading_try = 0
+    weights_path = 'model_weights.npz'
 
+    # exported weights play without tensorflow, which is only imported when they are missing
+    if os.path.exists(weights_path):
+        agent = NumpyAgent(state_shape, nb_actions, weights_path)
+
+    else:
+        from agent import DQNAgent
+
+        agent = DQNAgent(state_shape, nb_actions)
 
-    while True:
         try:
-            agent.load_weights(weights_path)
-            break
+            agent.load_weights('model_weights.h5')
 
         except Exception:
-            weights_loading_try += 1
-            
-            if weights_loading_try > 1:
-                print('Unable to load model weights')
-                break
+            print('Unable to load model weights')
 
 
     while True:
@@ -0,0 +1,397 @@
+import json
+import os
+import random
+import numpy as np
+from env import get_packed_shape, pack_observations, unpack_observations
+
+
+class ReplayMemory():
+    # with packed, states are stored bit-packed and only unpacked when a batch is read
+    def __init__(self, limit, state_shape, packed=False):
+        assert type(limit) is int and limit > 0, 'limit must be a positive integer'
+
+        self.limit = limit
+        self.state_shape = tuple(state_shape)
+        self.packed = packed
+        self.stored_state_shape = get_packed_shape(self.state_shape) if packed else self.state_shape
+        self.size = 0
+        self.cursor = 0
+
+        # observations only hold 0/1 values
+        self.states = np.zeros(shape=(limit,) + self.stored_state_shape, dtype=np.uint8)
+        self.actions = np.zeros(shape=(limit,), dtype=np.int8)
+        self.rewards = np.zeros(shape=(limit,), dtype=np.float32)
+        self.next_states = np.zeros(shape=(limit,) + self.stored_state_shape, dtype=np.uint8)
+        self.terminals = np.zeros(shape=(limit,), dtype=bool)
+
+
+    def __len__(self):
+        return self.size
+
+
+    def encode_states(self, states, nb_states):
+        if self.packed:
+            return pack_observations(states, self.state_shape)
+
+        return np.reshape(states, (nb_states,) + self.state_shape)
+
+
+    def decode_states(self, *states):
+        # all the states of a batch are unpacked in one pass
+        if not self.packed:
+            return states
+
+        return np.split(unpack_observations(np.concatenate(states), self.state_shape), len(states))
+
+
+    def append(self, state, action, reward, next_state, terminal):
+        self.states[self.cursor] = self.encode_states(state, 1)[0]
+        self.actions[self.cursor] = action
+        self.rewards[self.cursor] = reward
+        self.next_states[self.cursor] = self.encode_states(next_state, 1)[0]
+        self.terminals[self.cursor] = terminal
+
+        self.cursor = (self.cursor + 1) % self.limit
+        self.size = min(self.size + 1, self.limit)
+
+
+    def extend(self, states, actions, rewards, next_states, terminals):
+        nb_experiences = len(actions)
+        indices = (self.cursor + np.arange(nb_experiences)) % self.limit
+
+        self.states[indices] = self.encode_states(states, nb_experiences)
+        self.actions[indices] = actions
+        self.rewards[indices] = rewards
+        self.next_states[indices] = self.encode_states(next_states, nb_experiences)
+        self.terminals[indices] = terminals
+
+        self.cursor = (self.cursor + nb_experiences) % self.limit
+        self.size = min(self.size + nb_experiences, self.limit)
+
+
+    def sample_indices(self, batch_size):
+        assert self.size > 0, 'self.sample_indices (ReplayMemory): memory is empty'
+
+        if batch_size <= self.size:
+            return np.array(random.sample(range(self.size), batch_size))
+
+        return np.random.randint(0, self.size, batch_size)
+
+
+    def get(self, indices):
+        states, next_states = self.decode_states(self.states[indices], self.next_states[indices])
+        return states, self.actions[indices], self.rewards[indices], next_states, self.terminals[indices]
+
+
+    def sample(self, batch_size):
+        return self.get(self.sample_indices(batch_size))
+
+
+    def get_arrays(self):
+        # arrays indexed by memory slot, only the first self.size slots hold experiences
+        return {'states':self.states, 'actions':self.actions, 'rewards':self.rewards, 'next_states':self.next_states,
+        'terminals':self.terminals}
+
+
+    def get_attributes(self):
+        return {'limit':self.limit, 'size':self.size, 'cursor':self.cursor}
+
+
+    def set_attributes(self, attributes):
+        assert attributes['limit'] == self.limit, 'self.set_attributes (ReplayMemory): memory limit does not match'
+
+        for name, value in attributes.items():
+            setattr(self, name, value)
+
+
+class MemmapReplayMemory(ReplayMemory):
+    # experiences live in np.memmap files under directory, so the limit is bounded by disk instead of RAM. an existing
+    # memory is reopened with its experiences, and mode 'r' opens it read-only for evaluation or analysis processes.
+    # size and cursor are kept in a small memmap of their own, so readers always see how far the writer got
+    def __init__(self, limit, state_shape, directory, mode='r+', packed=False):
+        assert type(limit) is int and limit > 0, 'limit must be a positive integer'
+        assert mode in ('r', 'r+'), "mode must be 'r' or 'r+'"
+
+        self.limit = limit
+        self.state_shape = tuple(state_shape)
+        self.packed = packed
+        self.stored_state_shape = get_packed_shape(self.state_shape) if packed else self.state_shape
+        self.directory = directory
+        self.mode = mode
+
+        meta_path = os.path.join(directory, 'meta.json')
+        exists = os.path.exists(meta_path)
+
+        if exists:
+            with open(meta_path) as file:
+                meta = json.load(file)
+
+            if meta['limit'] != limit or tuple(meta['state_shape']) != self.state_shape or meta.get('packed', False) != packed:
+                raise Exception(f"self.__init__ (MemmapReplayMemory): {directory} holds a memory of limit {meta['limit']}, "
+                f"state shape {tuple(meta['state_shape'])} and packed {meta.get('packed', False)}")
+
+        elif mode == 'r':
+            raise Exception(f'self.__init__ (MemmapReplayMemory): no memory found in {directory}')
+
+        else:
+            os.makedirs(directory, exist_ok=True)
+
+        file_mode = mode if exists else 'w+'
+
+        self.header = np.memmap(os.path.join(directory, 'header.dat'), dtype=np.int64, mode=file_mode, shape=(2,))
+        self.states = self.open_array('states', np.uint8, (limit,) + self.stored_state_shape, file_mode)
+        self.actions = self.open_array('actions', np.int8, (limit,), file_mode)
+        self.rewards = self.open_array('rewards', np.float32, (limit,), file_mode)
+        self.next_states = self.open_array('next_states', np.uint8, (limit,) + self.stored_state_shape, file_mode)
+        self.terminals = self.open_array('terminals', bool, (limit,), file_mode)
+
+        # the meta file is written last, so a memory whose creation was interrupted is created again
+        if not exists:
+            with open(meta_path, 'w') as file:
+                json.dump({'limit':limit, 'state_shape':list(self.state_shape), 'packed':packed}, file)
+
+
+    def open_array(self, name, dtype, shape, mode):
+        return np.memmap(os.path.join(self.directory, name + '.dat'), dtype=dtype, mode=mode, shape=shape)
+
+
+    @property
+    def size(self):
+        return int(self.header[0])
+
+
+    @size.setter
+    def size(self, value):
+        self.header[0] = value
+
+
+    @property
+    def cursor(self):
+        return int(self.header[1])
+
+
+    @cursor.setter
+    def cursor(self, value):
+        self.header[1] = value
+
+
+    def extend(self, states, actions, rewards, next_states, terminals):
+        nb_experiences = len(actions)
+        cursor = self.cursor
+
+        # writes go to contiguous slices, split where the ring wraps around. only the last limit experiences survive
+        start = max(0, nb_experiences - self.limit)
+
+        while start < nb_experiences:
+            slot = (cursor + start) % self.limit
+            stop = min(nb_experiences, start + self.limit - slot)
+            slots = slice(slot, slot + stop - start)
+
+            self.states[slots] = self.encode_states(states[start:stop], stop - start)
+            self.actions[slots] = actions[start:stop]
+            self.rewards[slots] = rewards[start:stop]
+            self.next_states[slots] = self.encode_states(next_states[start:stop], stop - start)
+            self.terminals[slots] = terminals[start:stop]
+
+            start = stop
+
+        self.cursor = (cursor + nb_experiences) % self.limit
+        self.size = min(self.size + nb_experiences, self.limit)
+
+
+    def sample_indices(self, batch_size):
+        assert self.size > 0, 'self.sample_indices (MemmapReplayMemory): memory is empty'
+
+        # sorted indices turn the gathers into one forward pass over the files
+        return np.sort(np.random.randint(0, self.size, batch_size))
+
+
+    def flush(self):
+        for array in (self.header,) + tuple(self.get_arrays().values()):
+            array.flush()
+
+
+class DedupReplayMemory(ReplayMemory):
+    # every observation is stored once: the next state of slot i is the state of slot i + 1. The last next state of an
+    # episode is kept in a slot of its own, which is flagged as invalid so it is never sampled as a transition
+    def __init__(self, limit, state_shape, packed=False):
+        assert type(limit) is int and limit > 1, 'limit must be an integer greater than 1'
+
+        self.limit = limit
+        self.state_shape = tuple(state_shape)
+        self.packed = packed
+        self.stored_state_shape = get_packed_shape(self.state_shape) if packed else self.state_shape
+        self.size = 0
+        self.cursor = 0
+        self.pending = False
+        self.continuable = False
+
+        self.states = np.zeros(shape=(limit,) + self.stored_state_shape, dtype=np.uint8)
+        self.actions = np.zeros(shape=(limit,), dtype=np.int8)
+        self.rewards = np.zeros(shape=(limit,), dtype=np.float32)
+        self.terminals = np.zeros(shape=(limit,), dtype=bool)
+        self.valid = np.zeros(shape=(limit,), dtype=bool)
+
+
+    def write_state(self, state):
+        self.states[self.cursor] = state
+        self.valid[self.cursor] = False
+        self.size = min(self.size + 1, self.limit)
+
+
+    def append(self, state, action, reward, next_state, terminal):
+        state = self.encode_states(state, 1)[0]
+
+        # the state continues the previous transition unless an episode ended in between
+        if not (self.continuable and np.array_equal(self.states[self.cursor], state)):
+            if self.pending:
+                self.cursor = (self.cursor + 1) % self.limit
+
+            self.write_state(state)
+
+        self.actions[self.cursor] = action
+        self.rewards[self.cursor] = reward
+        self.terminals[self.cursor] = terminal
+        self.valid[self.cursor] = True
+
+        self.cursor = (self.cursor + 1) % self.limit
+        self.write_state(self.encode_states(next_state, 1)[0])
+        self.pending = True
+        self.continuable = not terminal
+
+
+    def extend(self, states, actions, rewards, next_states, terminals):
+        for idx in range(len(actions)):
+            self.append(states[idx], actions[idx], rewards[idx], next_states[idx], terminals[idx])
+
+
+    def sample_indices(self, batch_size):
+        assert np.any(self.valid), 'self.sample_indices (DedupReplayMemory): memory is empty'
+
+        indices = np.random.randint(0, self.size, batch_size)
+        invalid = np.flatnonzero(~self.valid[indices])
+
+        while len(invalid) > 0:
+            indices[invalid] = np.random.randint(0, self.size, len(invalid))
+            invalid = invalid[~self.valid[indices[invalid]]]
+
+        return indices
+
+
+    def get(self, indices):
+        states, next_states = self.decode_states(self.states[indices], self.states[(indices + 1) % self.limit])
+        return states, self.actions[indices], self.rewards[indices], next_states, self.terminals[indices]
+
+
+    def get_arrays(self):
+        return {'states':self.states, 'actions':self.actions, 'rewards':self.rewards, 'terminals':self.terminals, 'valid':self.valid}
+
+
+    def get_attributes(self):
+        attributes = super().get_attributes()
+        attributes.update(pending=self.pending, continuable=self.continuable)
+        return attributes
+
+
+class SumTree():
+    def __init__(self, capacity):
+        assert type(capacity) is int and capacity > 1, 'capacity must be an integer greater than 1'
+
+        self.capacity = capacity
+        self.nb_leaves = 1 << (capacity - 1).bit_length()
+
+        # node i has children 2i and 2i + 1, the root is node 1 and the leaves start at nb_leaves
+        self.tree = np.zeros(shape=(2 * self.nb_leaves,), dtype=np.float64)
+
+
+    def total(self):
+        return self.tree[1]
+
+
+    def get(self, indices):
+        return self.tree[np.asarray(indices) + self.nb_leaves]
+
+
+    def update(self, indices, priorities):
+        nodes = np.asarray(indices) + self.nb_leaves
+        self.tree[nodes] = priorities
+        nodes = np.unique(nodes // 2)
+
+        while True:
+            self.tree[nodes] = self.tree[2 * nodes] + self.tree[2 * nodes + 1]
+
+            if nodes[0] == 1:
+                break
+
+            nodes = np.unique(nodes // 2)
+
+
+    def find(self, values):
+        values = np.array(values, dtype=np.float64)
+        nodes = np.ones(shape=values.shape, dtype=np.int64)
+
+        while nodes[0] < self.nb_leaves:
+            left_nodes = 2 * nodes
+            left_sums = self.tree[left_nodes]
+            go_right = (values >= left_sums) & (self.tree[left_nodes + 1] > 0)
+
+            values -= left_sums * go_right
+            nodes = left_nodes + go_right
+
+        return nodes - self.nb_leaves
+
+
+class PrioritizedReplayMemory(ReplayMemory):
+    def __init__(self, limit, state_shape, alpha=.6, beta=.4, epsilon=1e-6, packed=False):
+        super().__init__(limit, state_shape, packed)
+
+        self.alpha = alpha
+        self.beta = beta
+        self.epsilon = epsilon
+        self.max_priority = 1.
+        self.priorities = SumTree(limit)
+
+
+    def append(self, state, action, reward, next_state, terminal):
+        cursor = self.cursor
+        super().append(state, action, reward, next_state, terminal)
+        self.priorities.update([cursor], self.max_priority)
+
+
+    def extend(self, states, actions, rewards, next_states, terminals):
+        indices = (self.cursor + np.arange(len(actions))) % self.limit
+        super().extend(states, actions, rewards, next_states, terminals)
+        self.priorities.update(indices, self.max_priority)
+
+
+    def sample_indices(self, batch_size):
+        assert self.size > 0, 'self.sample_indices (PrioritizedReplayMemory): memory is empty'
+
+        # stratified sampling - one value from each of batch_size equal segments of the total priority
+        segment = self.priorities.total() / batch_size
+        values = (np.arange(batch_size) + np.random.uniform(size=batch_size)) * segment
+        return np.minimum(self.priorities.find(values), self.size - 1)
+
+
+    def get_importance_weights(self, indices):
+        probabilities = self.priorities.get(indices) / self.priorities.total()
+        weights = np.power(self.size * probabilities, -self.beta)
+        return (weights / np.max(weights)).astype(np.float32)
+
+
+    def update_priorities(self, indices, td_errors):
+        priorities = np.power(np.abs(td_errors) + self.epsilon, self.alpha)
+        self.priorities.update(indices, priorities)
+        self.max_priority = max(self.max_priority, float(np.max(priorities)))
+
+
+    def get_arrays(self):
+        arrays = super().get_arrays()
+        arrays['priorities'] = self.priorities.tree
+        return arrays
+
+
+    def get_attributes(self):
+        attributes = super().get_attributes()
+        attributes.update(alpha=self.alpha, beta=self.beta, epsilon=self.epsilon, max_priority=self.max_priority)
+        return attributes
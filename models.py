@@ -1,7 +1,6 @@
 from tensorflow.keras.models import Sequential
-from tensorflow.keras.layers import Flatten, Dense, Conv2D, Activation
+from tensorflow.keras.layers import Flatten, Dense, Conv2D, Activation, BatchNormalization
 from tensorflow.keras.optimizers import Adam
-from tensorflow.python.keras.layers.normalization import BatchNormalization
 
 
 def build_model_1(state_shape, nb_actions):
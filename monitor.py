@@ -0,0 +1,112 @@
+import json
+import os
+import resource
+import threading
+import time
+import tracemalloc
+
+
+def get_rss():
+    # current resident set size in bytes, falls back to the peak where /proc is not available
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+    except (OSError, ValueError):
+        return get_peak_rss()
+
+
+def get_peak_rss():
+    # ru_maxrss is in kilobytes on linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class MemoryMonitor():
+    # rss sampling is cheap enough to leave on. tracemalloc slows every python allocation, so allocation diffs are only
+    # collected with trace_allocations
+    def __init__(self, log_path='mem_log.jsonl', interval=100_000, top_n=10, trace_frames=1, trace_allocations=False,
+    heap_census=False, heap_census_limit=5):
+        self.log_path = log_path
+        self.interval = interval
+        self.top_n = top_n
+        self.trace_frames = trace_frames
+        self.trace_allocations = trace_allocations
+        self.heap_census = heap_census
+        self.heap_census_limit = heap_census_limit
+
+        self.log_file = None
+        self.log_lock = threading.Lock()
+        self.prev_snapshot = None
+        self.census_thread = None
+        self.started_tracing = False
+
+
+    def start(self):
+        self.log_file = open(self.log_path, 'a+')
+
+        if self.trace_allocations:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(self.trace_frames)
+                self.started_tracing = True
+
+            self.prev_snapshot = self.take_snapshot()
+
+
+    def take_snapshot(self):
+        return tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+
+
+    def write(self, record):
+        with self.log_lock:
+            self.log_file.write(json.dumps(record) + '\n')
+            self.log_file.flush()
+
+
+    def sample(self, step):
+        assert self.log_file is not None, 'self.sample (MemoryMonitor): monitor must be started'
+
+        record = {'type':'sample', 'time':time.time(), 'step':step, 'rss':get_rss(), 'peak_rss':get_peak_rss()}
+
+        if self.trace_allocations:
+            snapshot = self.take_snapshot()
+            traced, traced_peak = tracemalloc.get_traced_memory()
+            record['traced'] = traced
+            record['traced_peak'] = traced_peak
+
+            # growth since the previous sample, largest first
+            record['top_diffs'] = [{'location':str(stat.traceback), 'size':stat.size, 'size_diff':stat.size_diff,
+            'count_diff':stat.count_diff} for stat in snapshot.compare_to(self.prev_snapshot, 'lineno')[:self.top_n]]
+            self.prev_snapshot = snapshot
+
+        self.write(record)
+
+        if self.heap_census and (self.census_thread is None or not self.census_thread.is_alive()):
+            self.census_thread = threading.Thread(target=self.run_heap_census, args=(step,), daemon=True)
+            self.census_thread.start()
+
+
+    def run_heap_census(self, step):
+        from pympler import muppy, summary
+
+        start_time = time.perf_counter()
+        rows = summary.summarize(muppy.get_objects())
+        rows = sorted(rows, key=lambda row: row[2], reverse=True)[:self.heap_census_limit]
+
+        self.write({'type':'heap_census', 'time':time.time(), 'step':step, 'duration':time.perf_counter() - start_time,
+        'objects':[{'type':row[0], 'count':row[1], 'size':row[2]} for row in rows]})
+
+
+    def close(self):
+        if self.census_thread is not None:
+            self.census_thread.join()
+            self.census_thread = None
+
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+
+        self.prev_snapshot = None
+
+        if self.log_file is not None:
+            self.log_file.close()
+            self.log_file = None
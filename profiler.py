@@ -0,0 +1,151 @@
+import csv
+import json
+import time
+from contextlib import nullcontext
+
+
+class Phase():
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.start_time = None
+
+
+    def __enter__(self):
+        self.start_time = time.perf_counter()
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        elapsed = time.perf_counter() - self.start_time
+        self.profiler.totals[self.name] += elapsed
+        self.profiler.interval_totals[self.name] += elapsed
+
+
+class Profiler():
+    # phases are timed with 'with profiler.phase(name):' blocks, reports are written as json lines or, for paths ending with
+    # .csv, as one csv row per phase
+    def __init__(self, log_path='profile.jsonl', interval=10_000, verbose=False):
+        self.log_path = log_path
+        self.interval = interval
+        self.verbose = verbose
+
+        self.phases = {}
+        self.totals = {}
+        self.interval_totals = {}
+        self.nb_steps = 0
+        self.nb_train_steps = 0
+        self.interval_nb_steps = 0
+        self.interval_nb_train_steps = 0
+
+        self.csv_format = log_path is not None and log_path.endswith('.csv')
+        self.log_file = None
+        self.csv_writer = None
+        self.start_time = None
+        self.interval_start_time = None
+        self.last_record = None
+
+
+    def start(self):
+        self.start_time = time.perf_counter()
+        self.interval_start_time = self.start_time
+
+        if self.log_path is not None and self.log_file is None:
+            self.log_file = open(self.log_path, 'a+', newline='')
+
+            if self.csv_format:
+                self.csv_writer = csv.writer(self.log_file)
+
+                if self.log_file.tell() == 0:
+                    self.csv_writer.writerow(['step', 'elapsed', 'steps_per_sec', 'train_steps_per_sec', 'phase', 'interval_time',
+                    'total_time'])
+
+
+    def phase(self, name):
+        if name not in self.phases:
+            self.phases[name] = Phase(self, name)
+            self.totals[name] = 0.
+            self.interval_totals[name] = 0.
+
+        return self.phases[name]
+
+
+    def count_steps(self, nb_steps=1):
+        self.nb_steps += nb_steps
+        self.interval_nb_steps += nb_steps
+
+
+    def count_train_steps(self, nb_train_steps=1):
+        self.nb_train_steps += nb_train_steps
+        self.interval_nb_train_steps += nb_train_steps
+
+
+    def report(self, step):
+        now = time.perf_counter()
+        interval_time = max(now - self.interval_start_time, 1e-9)
+
+        record = {'step':step, 'elapsed':now - self.start_time, 'steps':self.nb_steps, 'train_steps':self.nb_train_steps,
+        'steps_per_sec':self.interval_nb_steps / interval_time, 'train_steps_per_sec':self.interval_nb_train_steps / interval_time,
+        'phases':{name:{'interval_time':self.interval_totals[name], 'total_time':self.totals[name]} for name in self.phases}}
+
+        if self.csv_writer is not None:
+            for name, times in record['phases'].items():
+                self.csv_writer.writerow([step, record['elapsed'], record['steps_per_sec'], record['train_steps_per_sec'], name,
+                times['interval_time'], times['total_time']])
+
+        elif self.log_file is not None:
+            self.log_file.write(json.dumps(record) + '\n')
+
+        if self.log_file is not None:
+            self.log_file.flush()
+
+        for name in self.interval_totals:
+            self.interval_totals[name] = 0.
+
+        self.interval_nb_steps = 0
+        self.interval_nb_train_steps = 0
+        self.interval_start_time = now
+        self.last_record = record
+
+        return record
+
+
+    def get_log(self):
+        if not self.verbose or self.last_record is None:
+            return None
+
+        record = self.last_record
+        phases_time = sum(times['interval_time'] for times in record['phases'].values())
+        phases_log = ' '.join(f"{name} {times['interval_time'] * 100 / max(phases_time, 1e-9):.0f}%" for name, times in
+        record['phases'].items())
+
+        return f"{record['steps_per_sec']:.0f} steps/s - {record['train_steps_per_sec']:.1f} train steps/s - {phases_log}"
+
+
+    def close(self):
+        if self.log_file is not None:
+            self.log_file.close()
+            self.log_file = None
+            self.csv_writer = None
+
+
+class NullProfiler():
+    # stands in when profiling is off, so the hot paths cost one method call and an empty with block per phase
+    def __init__(self):
+        self.context = nullcontext()
+
+
+    def phase(self, name):
+        return self.context
+
+
+    def count_steps(self, nb_steps=1):
+        pass
+
+
+    def count_train_steps(self, nb_train_steps=1):
+        pass
+
+
+    def get_log(self):
+        return None
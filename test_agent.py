@@ -1,7 +1,6 @@
 from env import SnakeEnv
-from agent import DQNAgent
+from inference import NumpyAgent
 import numpy as np
-import models
 
 
 env = SnakeEnv()
@@ -10,13 +9,11 @@ env = SnakeEnv()
 state_shape = env.observation_space.shape
 nb_actions = env.action_space.nb_actions
 
-model = models.build_model_8(state_shape, nb_actions)
-target_model = models.build_model_8(state_shape, nb_actions)
-agent = DQNAgent(state_shape, nb_actions, model=model, target_model=target_model)
+# model_weights.npz is written by train_agent.py (DQNAgent.export_weights), playing it does not need tensorflow
+agent = NumpyAgent(state_shape, nb_actions, 'model_weights.npz')
 
-agent.load_weights('model_weights.h5')
-history = agent.test(env, 100, visualize=False)
+history = agent.test(env, 100, visualize=False, nb_envs=100)
 env.close()
 
 print('mean rewards:', np.mean(history['rewards']))
-print('mean scores:', np.mean(history['scores']))
\ No newline at end of file
+print('mean scores:', np.mean(history['scores']))
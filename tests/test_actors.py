@@ -0,0 +1,28 @@
+import os
+import subprocess
+import sys
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCRIPT = '''
+from env import SnakeEnv
+from agent import DQNAgent
+
+if __name__ == '__main__':
+    agent = DQNAgent((15, 17, 3), 4, memory_limit=5000)
+    agent.fit_distributed(SnakeEnv, 3000, 2, chunk_size=200, weights_sync_steps=5, save_weights_steps=None, verbose=0)
+    print('fit_distributed returned')
+'''
+
+
+def test_fit_distributed_process_exits(tmp_path):
+    # the interpreter used to hang at exit on queue feeder threads once the actors were stopped
+    script_path = tmp_path / 'fit_distributed.py'
+    script_path.write_text(SCRIPT)
+
+    result = subprocess.run([sys.executable, str(script_path)], cwd=ROOT, env=dict(os.environ, PYTHONPATH=ROOT),
+    capture_output=True, text=True, timeout=300)
+
+    assert result.returncode == 0, result.stderr[-2000:]
+    assert 'fit_distributed returned' in result.stdout
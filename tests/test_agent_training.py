@@ -0,0 +1,36 @@
+import numpy as np
+import tensorflow as tf
+from agent import DQNAgent
+
+
+STATE_SHAPE = (15, 17, 3)
+NB_ACTIONS = 4
+
+
+def test_huber_loss_without_fused_train_step():
+    agent = DQNAgent(STATE_SHAPE, NB_ACTIONS, memory_limit=100, huber_loss=True)
+    assert isinstance(agent.model.loss, tf.keras.losses.Huber)
+
+    states = np.random.randint(0, 2, size=(64,) + STATE_SHAPE, dtype=np.uint8)
+    agent.store_experiences(states, np.random.randint(0, NB_ACTIONS, 64), np.random.uniform(-1, 1, 64), states, np.zeros(64, dtype=bool))
+    agent.replay_experience(32, 1)
+
+
+def test_huber_loss_matches_between_train_paths():
+    # both paths start from the same weights and take one step on the same batch
+    np.random.seed(0)
+    fused = DQNAgent(STATE_SHAPE, NB_ACTIONS, memory_limit=100, huber_loss=True, fused_train_step=True, learning_rate=.01)
+    compiled = DQNAgent(STATE_SHAPE, NB_ACTIONS, memory_limit=100, huber_loss=True, learning_rate=.01)
+    compiled.model.set_weights(fused.model.get_weights())
+    compiled.update_target_weights()
+
+    states = np.random.randint(0, 2, size=(32,) + STATE_SHAPE, dtype=np.uint8)
+    rewards = np.random.uniform(-50, 50, 32)
+
+    for agent in (fused, compiled):
+        agent.store_experiences(states, np.arange(32) % NB_ACTIONS, rewards, np.roll(states, 1, axis=0), np.zeros(32, dtype=bool))
+        agent.memory.sample_indices = lambda batch_size: np.arange(batch_size)
+        agent.replay_experience(32, 0)
+
+    for fused_weights, compiled_weights in zip(fused.model.get_weights(), compiled.model.get_weights()):
+        np.testing.assert_allclose(fused_weights, compiled_weights, atol=1e-5)
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+from agent import DQNAgent
+from checkpoint import CheckpointManager
+
+
+STATE_SHAPE = (15, 17, 3)
+NB_ACTIONS = 4
+
+
+def fill_memory(agent, nb_experiences):
+    states = np.random.randint(0, 2, size=(nb_experiences,) + STATE_SHAPE, dtype=np.uint8)
+    agent.store_experiences(states, np.random.randint(0, NB_ACTIONS, nb_experiences), np.random.uniform(-1, 1, nb_experiences),
+    np.roll(states, 1, axis=0), np.random.uniform(size=nb_experiences) < .1)
+
+
+@pytest.mark.parametrize('memory_options', [{}, {'prioritized_replay':True}, {'packed_observations':True}])
+def test_round_trip_partly_filled_memory(tmp_path, memory_options):
+    # the memory holds fewer experiences than its limit, so only part of every slot array is written
+    agent = DQNAgent(STATE_SHAPE, NB_ACTIONS, memory_limit=3000, fused_train_step=True, **memory_options)
+    fill_memory(agent, 1600)
+    agent.replay_experience(32, 1)
+
+    checkpoint = CheckpointManager(str(tmp_path), keep_last=2)
+    checkpoint.save(agent, 1600, {'step':1600, 'episode_nb':7}, {'episodes':[0, 1], 'scores':[2, 3]})
+
+    restored = DQNAgent(STATE_SHAPE, NB_ACTIONS, memory_limit=3000, fused_train_step=True, **memory_options)
+    fit_state, history = checkpoint.restore(restored)
+
+    assert fit_state == {'step':1600, 'episode_nb':7}
+    assert history == {'episodes':[0, 1], 'scores':[2, 3]}
+    assert restored.eps == agent.eps
+    assert restored.memory.get_attributes() == agent.memory.get_attributes()
+
+    for name, array in agent.memory.get_arrays().items():
+        assert np.array_equal(restored.memory.get_arrays()[name], array), name
+
+    for weights, restored_weights in zip(agent.model.get_weights(), restored.model.get_weights()):
+        assert np.array_equal(weights, restored_weights)
+
+
+def test_rotation_keeps_last_checkpoints(tmp_path):
+    agent = DQNAgent(STATE_SHAPE, NB_ACTIONS, memory_limit=100)
+    fill_memory(agent, 10)
+    checkpoint = CheckpointManager(str(tmp_path), keep_last=2)
+
+    for step in (100, 200, 300):
+        checkpoint.save(agent, step, {'step':step}, {})
+
+    assert [path[-3:] for path in checkpoint.get_checkpoints()] == ['200', '300']
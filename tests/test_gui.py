@@ -0,0 +1,26 @@
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import pygame
+from env import Point, SnakeEnv
+
+
+def test_head_off_board_leaves_score_bar(monkeypatch):
+    env = SnakeEnv()
+    env.gui_include_timer = False
+    monkeypatch.setattr(pygame.display, 'update', lambda *args, **kwargs: None)
+
+    env.reset()
+    env.render()
+    gui = env.gui
+
+    score_bar = pygame.Rect(0, gui.board_height, gui.window_width, gui.text_height)
+    before = pygame.image.tostring(gui.window.subsurface(score_bar), 'RGB')
+
+    # the head of a snake that just hit the bottom wall sits one row below the board
+    env.snake[0] = Point(env.height, env.snake[0].column)
+    env.render()
+    after = pygame.image.tostring(gui.window.subsurface(score_bar), 'RGB')
+
+    env.close()
+    assert before == after
@@ -0,0 +1,50 @@
+import os
+import numpy as np
+from agent import DQNAgent
+from checkpoint import CheckpointManager
+from env import SnakeEnv
+from history import HistoryWriter, load_history
+
+
+def test_truncate_drops_rows_after_state(tmp_path):
+    writer = HistoryWriter(str(tmp_path), chunk_size=7)
+
+    for episode in range(30):
+        writer.append('episodes', episode=episode, score=episode % 3)
+
+    state = writer.get_state()
+
+    for episode in range(30, 45):
+        writer.append('episodes', episode=episode, score=episode % 3)
+
+    writer.close()
+
+    writer = HistoryWriter(str(tmp_path), chunk_size=7)
+    writer.truncate(state)
+
+    # the chunk holding the cut is rewritten through a temporary file
+    assert not any(name.startswith('tmp-') for name in os.listdir(tmp_path))
+    writer.append('episodes', episode=30, score=0)
+    writer.close()
+
+    assert np.array_equal(load_history(str(tmp_path), 'episodes')['episode'], np.arange(31))
+    assert np.array_equal(load_history(str(tmp_path), 'episodes', bin_size=10)['episode'], [4.5, 14.5, 24.5, 30.])
+
+
+def test_resume_checkpoint_saved_without_history_writer(tmp_path):
+    checkpoint = CheckpointManager(str(tmp_path / 'checkpoints'), checkpoint_steps=200)
+    fit_options = dict(verbose=0, save_weights_steps=None, validation_steps=10**9, nb_max_episode_steps=50, checkpoint=checkpoint)
+
+    agent = DQNAgent((15, 17, 3), 4, memory_limit=500)
+    agent.fit(SnakeEnv(), 400, **fit_options)
+
+    # history left in the directory by an earlier run
+    writer = HistoryWriter(str(tmp_path / 'history'))
+    writer.append('episodes', episode=0, reward=0, steps=1, score=0)
+    writer.flush()
+
+    resumed = DQNAgent((15, 17, 3), 4, memory_limit=500)
+    resumed.fit(SnakeEnv(), 600, history_writer=writer, **fit_options)
+    writer.close()
+
+    assert len(load_history(str(tmp_path / 'history'), 'episodes')['episode']) > 0
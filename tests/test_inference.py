@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+import models
+from inference import NumpyAgent, NumpyModel, check_parity
+
+
+STATE_SHAPE = (15, 17, 3)
+NB_ACTIONS = 4
+
+
+@pytest.mark.parametrize('model_idx', range(1, 9))
+def test_parity_with_keras(tmp_path, model_idx):
+    np.random.seed(model_idx)
+    model = getattr(models, f'build_model_{model_idx}')(STATE_SHAPE, NB_ACTIONS)
+
+    # batch normalization with its default statistics is the identity, random ones exercise the folding
+    for layer in model.layers:
+        if type(layer).__name__ == 'BatchNormalization':
+            layer.set_weights([np.random.uniform(.5, 2., np.shape(weights)).astype(np.float32) for weights in layer.get_weights()])
+
+    filepath = str(tmp_path / 'model.npz')
+    assert check_parity(model, filepath, atol=1e-4) <= 1e-4
+
+    states = np.random.randint(0, 2, size=(64,) + STATE_SHAPE).astype(np.float32)
+    keras_q_values = np.asarray(model.predict_on_batch(states))
+    numpy_q_values = NumpyModel(filepath).predict(states)
+
+    np.testing.assert_allclose(numpy_q_values, keras_q_values, atol=1e-4)
+    assert np.array_equal(np.argmax(numpy_q_values, axis=1), np.argmax(keras_q_values, axis=1))
+    assert np.array_equal(NumpyAgent(STATE_SHAPE, NB_ACTIONS, filepath).select_actions(states), np.argmax(keras_q_values, axis=1))
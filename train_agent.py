@@ -3,31 +3,44 @@ from agent import DQNAgent
 import numpy as np
 import os
 import models
-import pickle
+from monitor import MemoryMonitor
+from checkpoint import CheckpointManager
+from history import HistoryWriter
 
 
 env = SnakeEnv()
 
 weights_path = 'model_weights.h5'
-log_path = 'training_log.pkl'
+export_path = 'model_weights.npz'
+history_path = 'training_history'
 
 state_shape = env.observation_space.shape
 nb_actions = env.action_space.nb_actions
 training_steps = 18_000_000
 
+# tracemalloc slows down every allocation, turn it on only to hunt a leak
+trace_allocations = False
+
 model = models.build_model_8(state_shape, nb_actions)
 target_model = models.build_model_8(state_shape, nb_actions)
 
 agent = DQNAgent(state_shape, nb_actions, model=model, target_model=target_model, memory_limit=40_000, eps_decay_steps=training_steps)
 
-agent.create_experiences(env, 1000)
+checkpoint = CheckpointManager('checkpoints', keep_last=3, checkpoint_steps=100_000)
 
-if os.path.exists(weights_path):
-    agent.load_weights(weights_path)
+# a checkpoint restores the weights and the replay memory itself when fit starts
+if checkpoint.latest() is None:
+    agent.create_experiences(env, 1000)
 
-history = agent.fit(env, training_steps, batch_size=64, validation_steps=100_000, validation_episodes=10)
+    if os.path.exists(weights_path):
+        agent.load_weights(weights_path)
 
-agent.save_weights(weights_path)
+history_writer = HistoryWriter(history_path)
 
-with open(log_path, 'wb+') as file:
-    pickle.dump(history, file, pickle.HIGHEST_PROTOCOL)
\ No newline at end of file
+agent.fit(env, training_steps, batch_size=64, validation_steps=100_000, validation_episodes=10,
+memory_monitor=MemoryMonitor('mem_log.jsonl', interval=100_000, trace_allocations=trace_allocations), checkpoint=checkpoint,
+validation_env=SnakeEnv(), history_writer=history_writer)
+
+agent.save_weights(weights_path)
+agent.export_weights(export_path)
+history_writer.close()
\ No newline at end of file
@@ -0,0 +1,83 @@
+import threading
+import numpy as np
+
+
+class BackgroundValidator():
+    # plays validation episodes on an env of its own with a snapshot of the weights, on its own thread. a snapshot still
+    # waiting when a newer one arrives is replaced by it, so validations never queue up behind each other
+    def __init__(self, agent, env, nb_episodes, nb_max_episode_steps=-1):
+        self.agent = agent
+        self.env = env
+        self.nb_episodes = nb_episodes
+        self.nb_max_episode_steps = nb_max_episode_steps
+
+        self.condition = threading.Condition()
+        self.pending_validation = None
+        self.results = []
+        self.stopped = False
+        self.error = None
+        self.thread = None
+
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+
+    def run(self):
+        try:
+            while True:
+                with self.condition:
+                    while self.pending_validation is None and not self.stopped:
+                        self.condition.wait()
+
+                    if self.pending_validation is None:
+                        return
+
+                    episode_nb, weights = self.pending_validation
+                    self.pending_validation = None
+
+                self.agent.model.set_weights(weights)
+                history = self.agent.test(self.env, self.nb_episodes, nb_max_episode_steps=self.nb_max_episode_steps, verbose=0,
+                visualize=False)
+
+                with self.condition:
+                    self.results.append((episode_nb, np.mean(history['scores'])))
+
+        except Exception as error:
+            with self.condition:
+                self.error = error
+
+
+    def check_error(self):
+        if self.error is not None:
+            raise Exception('self.check_error (BackgroundValidator): validation thread failed') from self.error
+
+
+    def request_validation(self, episode_nb, weights):
+        with self.condition:
+            self.check_error()
+            self.pending_validation = (episode_nb, weights)
+            self.condition.notify_all()
+
+
+    def get_results(self):
+        with self.condition:
+            self.check_error()
+            results = self.results
+            self.results = []
+
+        return results
+
+
+    def close(self):
+        # a pending validation still runs before the thread exits
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+        return self.get_results()
@@ -0,0 +1,226 @@
+from env import ActionSpace, ObservationSpace
+import numpy as np
+
+
+class VecSnakeEnv():
+
+    def __init__(self, nb_envs):
+        assert type(nb_envs) is int and nb_envs > 0, 'nb_envs must be a positive integer'
+        self.nb_envs = nb_envs
+        self.env_indices = np.arange(nb_envs)
+
+        # board attributes
+        self.height = 15
+        self.width = 17
+        self.nb_cells = self.height * self.width
+
+        # snake attributes
+        self.snake_starting_len = 3
+        self.head_starting_point = (self.height//2, self.width//2)
+        self.max_spawning_attempts = 100
+
+        assert self.head_starting_point[1] >= self.snake_starting_len - 1, \
+        'self.__init__ (VecSnakeEnv): board is too narrow to spawn the snake'
+
+        # movement attributes
+        self.action_right = 0
+        self.action_left = 1
+        self.action_up = 2
+        self.action_down = 3
+
+        # rows are indexed by action, columns are (row, column) offsets
+        self.action_map = np.array([[0, 1], [0, -1], [-1, 0], [1, 0]], dtype=np.int64)
+
+        # state attributes
+        self.nb_layers = 3
+        self.body_layer = 0
+        self.head_layer = 1
+        self.apple_layer = 2
+
+        # score attributes
+        self.best_score = 0
+        self.curr_score = np.zeros(nb_envs, dtype=np.int64)
+
+        # other properties
+        self.action_space = ActionSpace(4)
+        self.observation_space = ObservationSpace(shape=(self.height, self.width, self.nb_layers), dtype='byte')
+
+        # game codes
+        self.normal_move_code = 0
+        self.eating_apple_code = 1
+        self.winning_game_code = 2
+        self.losing_game_code = 3
+
+        # rewards
+        self.approaching_reward = 1
+        self.moving_away_reward = -1
+        self.eating_apple_reward = 10
+        self.winning_game_reward = 100
+        self.losing_game_reward = -100
+
+        # no progress termination
+        self.termination_step = 300
+
+        # boards - snakes are stored as ring buffers of flat cell indices, the head is at head_ptr and the tail is
+        # snake_len - 1 slots behind it
+        self.snake_capacity = self.nb_cells + 1
+        self.state = np.zeros(shape=(nb_envs,) + self.observation_space.shape, dtype=self.observation_space.dtype)
+        self.occupancy = np.zeros(shape=(nb_envs, self.nb_cells), dtype=bool)
+        self.snake = np.zeros(shape=(nb_envs, self.snake_capacity), dtype=np.int64)
+        self.head_ptr = np.zeros(shape=(nb_envs,), dtype=np.int64)
+        self.snake_len = np.zeros(shape=(nb_envs,), dtype=np.int64)
+        self.dir = np.zeros(shape=(nb_envs, 2), dtype=np.int64)
+        self.apple = np.zeros(shape=(nb_envs,), dtype=np.int64)
+        self.snake_apple_distance = np.zeros(shape=(nb_envs,), dtype=np.int64)
+        self.no_progress_step_nb = np.zeros(shape=(nb_envs,), dtype=np.int64)
+
+
+    def get_heads(self, envs):
+        return self.snake[envs, self.head_ptr[envs]]
+
+
+    def get_snake_apple_manhattan_distance(self, envs):
+        head_rows, head_columns = np.divmod(self.get_heads(envs), self.width)
+        apple_rows, apple_columns = np.divmod(self.apple[envs], self.width)
+        return np.abs(apple_rows - head_rows) + np.abs(apple_columns - head_columns)
+
+
+    def randomize_apples(self, envs):
+        cells = np.random.randint(0, self.nb_cells, size=len(envs))
+        occupied = self.occupancy[envs, cells]
+        spawning_attempts = 0
+
+        while np.any(occupied) and spawning_attempts < self.max_spawning_attempts:
+            cells[occupied] = np.random.randint(0, self.nb_cells, size=np.count_nonzero(occupied))
+            occupied = self.occupancy[envs, cells]
+            spawning_attempts += 1
+
+        # nearly full boards - pick uniformly among the free cells
+        for idx in np.flatnonzero(occupied):
+            cells[idx] = np.random.choice(np.flatnonzero(~self.occupancy[envs[idx]]))
+
+        self.apple[envs] = cells
+        rows, columns = np.divmod(cells, self.width)
+        self.state[envs, rows, columns, self.apple_layer] = 1
+
+
+    def reset(self, mask=None):
+        envs = self.env_indices if mask is None else np.flatnonzero(mask)
+
+        if len(envs) == 0:
+            return np.copy(self.state)
+
+        self.state[envs] = 0
+        self.occupancy[envs] = False
+        self.curr_score[envs] = 0
+        self.no_progress_step_nb[envs] = 0
+        self.dir[envs] = self.action_map[self.action_right]
+
+        # snake spawns horizontally, facing right, with its tail to the left of the head
+        row, head_column = self.head_starting_point
+        columns = np.arange(head_column - self.snake_starting_len + 1, head_column + 1)
+        cells = row * self.width + columns
+
+        self.snake[envs, :self.snake_starting_len] = cells
+        self.head_ptr[envs] = self.snake_starting_len - 1
+        self.snake_len[envs] = self.snake_starting_len
+        self.occupancy[envs[:, None], cells[None, :]] = True
+        self.state[envs[:, None], row, columns[None, :-1], self.body_layer] = 1
+        self.state[envs, row, head_column, self.head_layer] = 1
+
+        self.randomize_apples(envs)
+        self.snake_apple_distance[envs] = self.get_snake_apple_manhattan_distance(envs)
+
+        return np.copy(self.state)
+
+
+    def step(self, actions, mask=None):
+        # boards outside of mask are left untouched, their rewards are 0 and they are never done
+        envs = self.env_indices if mask is None else np.flatnonzero(mask)
+        actions = np.asarray(actions, dtype=np.int64)
+        assert actions.shape == (self.nb_envs,), 'self.step (VecSnakeEnv): expected one action per env'
+
+        rewards = np.zeros(shape=(self.nb_envs,), dtype=np.int64)
+        dones = np.zeros(shape=(self.nb_envs,), dtype=bool)
+        infos = [{} for _ in range(self.nb_envs)]
+
+        # masks below are indexed like envs, envs[mask] maps them back to boards
+
+        # update directions - reversing into the body is ignored
+        new_dirs = self.action_map[actions[envs]]
+        turning = np.any(new_dirs != -self.dir[envs], axis=1)
+        self.dir[envs[turning]] = new_dirs[turning]
+
+        heads = self.get_heads(envs)
+        head_rows, head_columns = np.divmod(heads, self.width)
+        next_rows = head_rows + self.dir[envs, 0]
+        next_columns = head_columns + self.dir[envs, 1]
+        in_bounds = (next_rows >= 0) & (next_rows < self.height) & (next_columns >= 0) & (next_columns < self.width)
+        next_heads = np.where(in_bounds, next_rows * self.width + next_columns, 0)
+
+        eating = in_bounds & (next_heads == self.apple[envs])
+        moving = envs[~eating]
+
+        # free the tails of snakes that do not grow before checking for collisions
+        tails = self.snake[moving, (self.head_ptr[moving] - self.snake_len[moving] + 1) % self.snake_capacity]
+        tail_rows, tail_columns = np.divmod(tails, self.width)
+        self.occupancy[moving, tails] = False
+        self.state[moving, tail_rows, tail_columns, self.body_layer] = 0
+        self.snake_len[moving] -= 1
+
+        losing = ~in_bounds | (self.occupancy[envs, next_heads] & ~eating)
+
+        # push the new heads
+        self.state[envs, head_rows, head_columns, self.head_layer] = 0
+        self.state[envs, head_rows, head_columns, self.body_layer] = 1
+        self.head_ptr[envs] = (self.head_ptr[envs] + 1) % self.snake_capacity
+        self.snake[envs, self.head_ptr[envs]] = next_heads
+        self.snake_len[envs] += 1
+
+        visible = envs[in_bounds]
+        self.occupancy[visible, next_heads[in_bounds]] = True
+        self.state[visible, next_rows[in_bounds], next_columns[in_bounds], self.head_layer] = 1
+
+        # eating apples
+        eaten = envs[eating]
+        self.no_progress_step_nb[eaten] = 0
+        self.curr_score[eaten] += 1
+        rewards[eaten] += self.eating_apple_reward
+        self.state[eaten, next_rows[eating], next_columns[eating], self.apple_layer] = 0
+
+        winning = eating & (self.snake_len[envs] == self.nb_cells)
+        rewards[envs[winning]] += self.winning_game_reward
+        dones[envs[winning]] = True
+        self.randomize_apples(envs[eating & ~winning])
+
+        # losing
+        rewards[envs[losing]] += self.losing_game_reward
+        dones[envs[losing]] = True
+
+        # normal moves
+        normal = ~eating & ~losing
+        normal_envs = envs[normal]
+        self.no_progress_step_nb[normal_envs] += 1
+        distances = self.get_snake_apple_manhattan_distance(envs)
+        rewards[normal_envs] += np.where(distances[normal] < self.snake_apple_distance[normal_envs], self.approaching_reward,
+        self.moving_away_reward)
+        dones[normal_envs] |= self.no_progress_step_nb[normal_envs] == self.termination_step
+        self.snake_apple_distance[envs] = distances
+
+        # auto reset finished boards
+        finished = np.flatnonzero(dones)
+
+        if len(finished) > 0:
+            self.best_score = max(self.best_score, int(np.max(self.curr_score[finished])))
+
+            for idx in finished:
+                infos[idx]['terminal_observation'] = np.copy(self.state[idx])
+                infos[idx]['score'] = int(self.curr_score[idx])
+
+            self.reset(dones)
+
+        return np.copy(self.state), rewards, dones, infos
+
+
+    def close(self):
+        pass